@@ -0,0 +1,161 @@
+"""Alignment of sequences with affine gap scores (Gotoh's algorithm)"""
+
+from tools import compile_scoring_matrix
+
+MINUS_INF = float('-inf')
+
+# Direction codes kept for every entry of the alignment matrix when a
+# traceback is requested. One byte per entry holds where each of the three
+# states came from: bits 0-1 for M, bits 2-3 for X and bits 4-5 for Y.
+FROM_M, FROM_X, FROM_Y, FROM_START = 0, 1, 2, 3
+
+
+def _affine_rows(seq_x, seq_y, scoring_matrix, gap_open, gap_extend,
+                 alignment, directions=None):
+    """
+    Fill the three Gotoh states row by row, keeping only the current row of
+    each. M ends with a pair of elements, X with an element of 'seq_x' against
+    a dash and Y with a dash against an element of 'seq_y'.
+
+    If 'directions' is a bytearray of size (m+1)(n+1), the direction byte of
+    entry (i, j) is stored at directions[i*(n+1) + j].
+
+    Return (score, i, j, state) where (score, i, j) is as for
+    compute_affine_alignment_score and 'state' is the state the optimal
+    alignment ends in.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+    x_length, y_length = len(seq_x), len(seq_y)
+    local = alignment == 'local'
+    width = y_length + 1
+
+    match = [0 if local else MINUS_INF] * width
+    gap_x = [MINUS_INF] * width
+    gap_y = [MINUS_INF] * width
+    match[0] = 0
+    if not local:
+        for j in range(1, width):
+            gap_y[j] = gap_open + (j - 1) * gap_extend
+            if directions is not None:
+                directions[j] = (FROM_M if j == 1 else FROM_Y) << 4
+    best, best_i, best_j = 0, 0, 0
+
+    for i in range(1, x_length+1):
+        scores_x = matrix.rows[x_codes[i-1]]
+        prev_match, prev_gap_x, prev_gap_y = match, gap_x, gap_y
+        match = [0 if local else MINUS_INF] + [0] * y_length
+        gap_x = [MINUS_INF if local else gap_open + (i - 1) * gap_extend] + \
+            [0] * y_length
+        gap_y = [MINUS_INF] * width
+        base = i * width
+        if directions is not None and not local:
+            directions[base] = (FROM_M if i == 1 else FROM_X) << 2
+
+        for j in range(1, width):
+            # M: pair x_i with y_j after any state at (i-1, j-1)
+            m_prev, m_from = prev_match[j-1], FROM_M
+            if prev_gap_x[j-1] > m_prev:
+                m_prev, m_from = prev_gap_x[j-1], FROM_X
+            if prev_gap_y[j-1] > m_prev:
+                m_prev, m_from = prev_gap_y[j-1], FROM_Y
+            if local and m_prev <= 0:
+                m_prev, m_from = 0, FROM_START
+            value = m_prev + scores_x[y_codes[j-1]]
+            match[j] = value
+
+            # X: x_i against a dash, opening or extending a gap from (i-1, j)
+            x_value, x_from = prev_match[j] + gap_open, FROM_M
+            if prev_gap_x[j] + gap_extend > x_value:
+                x_value, x_from = prev_gap_x[j] + gap_extend, FROM_X
+            if prev_gap_y[j] + gap_open > x_value:
+                x_value, x_from = prev_gap_y[j] + gap_open, FROM_Y
+            gap_x[j] = x_value
+
+            # Y: a dash against y_j, opening or extending a gap from (i, j-1)
+            y_value, y_from = match[j-1] + gap_open, FROM_M
+            if gap_y[j-1] + gap_extend > y_value:
+                y_value, y_from = gap_y[j-1] + gap_extend, FROM_Y
+            if gap_x[j-1] + gap_open > y_value:
+                y_value, y_from = gap_x[j-1] + gap_open, FROM_X
+            gap_y[j] = y_value
+
+            if directions is not None:
+                directions[base + j] = m_from | x_from << 2 | y_from << 4
+            if local and value > best:
+                best, best_i, best_j = value, i, j
+
+    if local:
+        return (best, best_i, best_j, FROM_M)
+    score, state = match[-1], FROM_M
+    if gap_x[-1] > score:
+        score, state = gap_x[-1], FROM_X
+    if gap_y[-1] > score:
+        score, state = gap_y[-1], FROM_Y
+    return (score, x_length, y_length, state)
+
+
+def compute_affine_alignment_score(seq_x, seq_y, scoring_matrix, gap_open,
+                                   gap_extend, alignment='global'):
+    """
+    (str, str, dict, int, int, str) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return (score, i, j) where score is the score of an optimal 'global' or
+    'local' alignment of 'seq_x' and 'seq_y' and (i, j) is where it ends. A
+    gap of length L scores gap_open + (L - 1) * gap_extend, in place of the
+    '-' entries of 'scoring_matrix'. Only one row of each of the three DP
+    states is kept, so memory is O(n).
+    """
+    return _affine_rows(seq_x, seq_y, scoring_matrix, gap_open, gap_extend,
+                        alignment)[:3]
+
+
+def compute_affine_alignment(seq_x, seq_y, scoring_matrix, gap_open,
+                             gap_extend, alignment='global'):
+    """
+    (str, str, dict, int, int, str) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return an optimal 'global' or 'local' alignment of 'seq_x' and 'seq_y' as
+    a tuple (score, align_x, align_y), scoring gaps as in
+    compute_affine_alignment_score.
+
+    The scores are kept in rolling rows as for the score-only version; the
+    traceback only needs the direction byte stored for every entry, i.e.
+    (m+1)(n+1) bytes instead of three matrices of Python ints.
+    """
+    x_length, y_length = len(seq_x), len(seq_y)
+    width = y_length + 1
+    directions = bytearray((x_length + 1) * width)
+    score, i, j, state = _affine_rows(seq_x, seq_y, scoring_matrix,
+                                      gap_open, gap_extend, alignment,
+                                      directions)
+
+    align_x, align_y = [], []
+    while i > 0 or j > 0:
+        code = directions[i * width + j]
+        if state == FROM_M:
+            align_x.append(seq_x[i-1])
+            align_y.append(seq_y[j-1])
+            state = code & 3
+            i -= 1
+            j -= 1
+            if state == FROM_START:
+                break
+        elif state == FROM_X:
+            align_x.append(seq_x[i-1])
+            align_y.append('-')
+            state = code >> 2 & 3
+            i -= 1
+        else:
+            align_x.append('-')
+            align_y.append(seq_y[j-1])
+            state = code >> 4 & 3
+            j -= 1
+
+    return (score, ''.join(reversed(align_x)), ''.join(reversed(align_y)))
@@ -0,0 +1,195 @@
+"""All-vs-all alignment scores of a set of sequences"""
+
+import hashlib
+import json
+import os
+from multiprocessing import Pool
+import numpy as np
+from tools import *
+
+_SEQUENCES = None
+_MATRIX = None
+_ALIGNMENT = None
+_SYMMETRIC = None
+
+
+def is_symmetric(scoring_matrix):
+    """
+    dict -> bool
+
+    Return True if scoring_matrix[x][y] == scoring_matrix[y][x] for all
+    symbols x and y, in which case aligning x against y scores the same as
+    aligning y against x.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    return all(matrix.rows[a][b] == matrix.rows[b][a]
+               for a in range(matrix.size) for b in range(a))
+
+
+def _pair_count(count, symmetric):
+    """Return the number of pairs of indices to align."""
+    return count * (count + 1) // 2 if symmetric else count * count
+
+
+def _pair(ordinal, count, symmetric):
+    """
+    Return the pair of indices (i, j) number 'ordinal' in row by row order:
+    among the upper triangle (diagonal included) if 'symmetric', else among
+    every pair.
+    """
+    if not symmetric:
+        return divmod(ordinal, count)
+    # row i starts at the ordinal i * count - i * (i - 1) // 2
+    low, high = 0, count - 1
+    while low < high:
+        middle = (low + high + 1) // 2
+        if middle * count - middle * (middle - 1) // 2 <= ordinal:
+            low = middle
+        else:
+            high = middle - 1
+    return (low, low + ordinal - (low * count - low * (low - 1) // 2))
+
+
+def _block_pairs(block, count, symmetric):
+    """Yield the pairs of indices of the block (number, i, j, size)."""
+    number, i, j, size = block
+    for _ in range(size):
+        yield (i, j)
+        j += 1
+        if j == count:
+            i += 1
+            j = i if symmetric else 0
+
+
+def _blocks(count, symmetric, chunk_size):
+    """
+    Yield the blocks (number, i, j, size) of 'size' consecutive pairs of
+    indices starting with (i, j), 'chunk_size' pairs per block.
+    """
+    total = _pair_count(count, symmetric)
+    for number, start in enumerate(range(0, total, chunk_size)):
+        yield (number, *_pair(start, count, symmetric),
+               min(chunk_size, total - start))
+
+
+def _init_worker(sequences, scoring_matrix, alignment, symmetric):
+    """Store the arguments shared by the blocks of all_vs_all_scores."""
+    global _SEQUENCES, _MATRIX, _ALIGNMENT, _SYMMETRIC
+    _SEQUENCES, _MATRIX, _ALIGNMENT = sequences, scoring_matrix, alignment
+    _SYMMETRIC = symmetric
+
+
+def _score_block(block):
+    """
+    Return (block, scores) for the block (number, i, j, size), compiling
+    the profile of each row sequence once for all its pairs in the block.
+    """
+    scores, profile = [], None
+    for i, j in _block_pairs(block, len(_SEQUENCES), _SYMMETRIC):
+        if profile is None or profile.query is not _SEQUENCES[i]:
+            profile = _MATRIX.profile(_SEQUENCES[i])
+        scores.append(compute_profile_score(profile, _SEQUENCES[j],
+                                            _ALIGNMENT)[0])
+    return (block, scores)
+
+
+def _checkpoint_key(sequences, matrix, alignment, chunk_size):
+    """Return the digest identifying an all_vs_all_scores computation."""
+    content = json.dumps([sequences, matrix.symbols, matrix.scores,
+                          alignment, chunk_size])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+def _read_checkpoint(checkpoint, key):
+    """
+    Yield the (number, scores) of the blocks completed in the file
+    'checkpoint', which must belong to the computation 'key'.
+    """
+    if not os.path.exists(checkpoint):
+        return
+    with open(checkpoint) as checkpoint_file:
+        header = checkpoint_file.readline()
+        if header and json.loads(header).get('key') != key:
+            raise ValueError('checkpoint {} belongs to another computation'
+                             .format(checkpoint))
+        for line in checkpoint_file:
+            try:
+                number, scores = json.loads(line)
+            except ValueError:
+                break
+            yield (number, scores)
+
+
+def all_vs_all_scores(sequences, scoring_matrix, alignment='global',
+                      processes=None, chunk_size=64, checkpoint=None):
+    """
+    Input: a list of sequences 'sequences' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return a square ndarray 'scores' where scores[i, j] is the score of an
+    optimal 'global' or 'local' alignment of sequences[i] and sequences[j].
+
+    When the scoring matrix is symmetric only the upper triangle is aligned
+    and mirrored. The pairs are split, row by row, into blocks of
+    'chunk_size' pairs scored by a pool of 'processes' worker processes (by
+    default one per core, processes=1 scores in this process) with the
+    score-only profile alignment. Blocks are generated as they are sent and
+    their scores written into the int64 array as they arrive, so no Python
+    object is kept per pair.
+
+    If 'checkpoint' is the name of a file, every completed block is appended
+    to it as a JSON line. Calling again with the same arguments and
+    'checkpoint' after an interruption only computes the blocks that are
+    missing from the file. A checkpoint written for other sequences, scoring
+    matrix, alignment or chunk size raises ValueError.
+    """
+    sequences = list(sequences)
+    count = len(sequences)
+    matrix = compile_scoring_matrix(scoring_matrix)
+    symmetric = is_symmetric(matrix)
+    result = np.empty((count, count), dtype=np.int64)
+
+    def keep(block, scores):
+        for (i, j), score in zip(_block_pairs(block, count, symmetric),
+                                 scores):
+            result[i, j] = score
+            if symmetric:
+                result[j, i] = score
+
+    done, checkpoint_file = set(), None
+    if checkpoint is not None:
+        key = _checkpoint_key(sequences, matrix, alignment, chunk_size)
+        temporary = '{}.{}.tmp'.format(checkpoint, os.getpid())
+        with open(temporary, 'w') as checkpoint_file:
+            checkpoint_file.write(json.dumps({'key': key}) + '\n')
+            for number, scores in _read_checkpoint(checkpoint, key):
+                start = number * chunk_size
+                keep((number, *_pair(start, count, symmetric), len(scores)),
+                     scores)
+                done.add(number)
+                checkpoint_file.write(json.dumps([number, scores]) + '\n')
+        os.replace(temporary, checkpoint)
+        checkpoint_file = open(checkpoint, 'a')
+
+    def collect(results):
+        for block, scores in results:
+            keep(block, scores)
+            if checkpoint_file is not None:
+                checkpoint_file.write(json.dumps([block[0], scores]) + '\n')
+                checkpoint_file.flush()
+
+    todo = (block for block in _blocks(count, symmetric, chunk_size)
+            if block[0] not in done)
+    missing = -(-_pair_count(count, symmetric) // chunk_size) - len(done)
+    try:
+        if processes == 1 or missing <= 1:
+            _init_worker(sequences, matrix, alignment, symmetric)
+            collect(map(_score_block, todo))
+        else:
+            with Pool(processes, _init_worker,
+                      (sequences, matrix, alignment, symmetric)) as pool:
+                collect(pool.imap_unordered(_score_block, todo))
+    finally:
+        if checkpoint_file is not None:
+            checkpoint_file.close()
+    return result
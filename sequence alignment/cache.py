@@ -0,0 +1,134 @@
+"""Content-addressed cache of alignment results"""
+
+import hashlib
+import json
+import os
+from collections import OrderedDict, namedtuple
+from tools import *
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'disk_hits', 'misses', 'size',
+                                     'maxsize'])
+
+
+def alignment_key(function, seq_x, seq_y, scoring_matrix, alignment):
+    """
+    (function, str, str, dict, str) -> str
+
+    Return the hexadecimal SHA-256 digest identifying the result of
+    function(seq_x, seq_y, scoring_matrix, alignment): it depends on the name
+    of 'function', both sequences, the contents of the scoring matrix (not
+    its identity) and the 'alignment' mode.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    content = json.dumps([function.__name__, seq_x, seq_y, matrix.symbols,
+                          matrix.scores, alignment])
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class AlignmentCache:
+    """
+    A cache of the results of the alignment functions of tools.py, keyed by
+    alignment_key.
+
+    At most 'maxsize' results are kept in memory, the least recently used
+    being evicted first (maxsize=None for no bound). When 'directory' is
+    given every result is also written there, one JSON file per key, so it
+    survives restarts; results missing from memory are looked up on disk
+    before being recomputed.
+
+    cache.align(...) and cache.score(...) stand for compute_alignment_traceback
+    and compute_alignment_score, and cache.info() returns the hit and miss
+    statistics as a CacheInfo tuple.
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._results = OrderedDict()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._results)
+
+    def info(self):
+        """Return the statistics of the cache as a CacheInfo tuple."""
+        return CacheInfo(self.hits, self.disk_hits, self.misses,
+                         len(self._results), self.maxsize)
+
+    def clear(self):
+        """Empty the memory cache and reset the statistics."""
+        self._results.clear()
+        self.hits = self.disk_hits = self.misses = 0
+
+    def lookup(self, function, seq_x, seq_y, scoring_matrix,
+               alignment='global'):
+        """
+        Return function(seq_x, seq_y, scoring_matrix, alignment), computed
+        only if no result is cached for the same arguments.
+        """
+        key = alignment_key(function, seq_x, seq_y, scoring_matrix, alignment)
+        if key in self._results:
+            self.hits += 1
+            self._results.move_to_end(key)
+            return self._results[key]
+
+        result = self._load(key)
+        if result is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            result = function(seq_x, seq_y, scoring_matrix, alignment)
+            self._save(key, result)
+        self._store(key, result)
+        return result
+
+    def align(self, seq_x, seq_y, scoring_matrix, alignment='global'):
+        """
+        (str, str, dict, str) -> tuple
+
+        Return the cached compute_alignment_traceback result (score, align_x,
+        align_y).
+        """
+        return self.lookup(compute_alignment_traceback, seq_x, seq_y,
+                           scoring_matrix, alignment)
+
+    def score(self, seq_x, seq_y, scoring_matrix, alignment='global'):
+        """
+        (str, str, dict, str) -> tuple
+
+        Return the cached compute_alignment_score result (score, i, j).
+        """
+        return self.lookup(compute_alignment_score, seq_x, seq_y,
+                           scoring_matrix, alignment)
+
+    def _store(self, key, result):
+        self._results[key] = result
+        if self.maxsize is not None:
+            while len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as result_file:
+                return tuple(json.load(result_file))
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, key, result):
+        if self.directory is None:
+            return
+        path = self._path(key)
+        temporary = '{}.{}.tmp'.format(path, os.getpid())
+        try:
+            with open(temporary, 'w') as result_file:
+                json.dump(list(result), result_file)
+            os.replace(temporary, path)
+        except OSError:
+            pass
@@ -2,8 +2,11 @@
 
 # import urllib2
 import matplotlib.pyplot as plt
+from cache import AlignmentCache
 from math import sqrt
-from random import shuffle
+from multiprocessing import Pool
+from random import Random, shuffle
+from significance import alignment_significance
 from tools import *
 
 # URLs for data files
@@ -13,6 +16,9 @@ from tools import *
 # CONSENSUS_PAX_URL = "http://storage.googleapis.com/codeskulptor-alg/alg_ConsensusPAXDomain.txt"
 # WORD_LIST_URL = "http://storage.googleapis.com/codeskulptor-assets/assets_scrabble_words3.txt"
 
+# Alignments shared by the functions below, computed once per run
+ALIGNMENT_CACHE = AlignmentCache()
+
 
 def read_protein(filename):
     """
@@ -55,14 +61,10 @@ def human_fruitfly_alignment():
     human_protein = read_protein('alg_HumanEyelessProtein.txt')
     fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
 
-    alignment_matrix = compute_alignment_matrix(human_protein,
-                                                fly_protein,
-                                                scores,
-                                                'local')
-    score, seq_human, seq_fly = compute_local_alignment(human_protein,
-                                                        fly_protein,
-                                                        scores,
-                                                        alignment_matrix)
+    score, seq_human, seq_fly = ALIGNMENT_CACHE.align(human_protein,
+                                                      fly_protein,
+                                                      scores,
+                                                      'local')
     print("The optimal alignment score:", score)
     print("The local alignment sequences of human and fruitfly proteins:\n")
     print(seq_human)
@@ -83,14 +85,10 @@ def consensus_alignment():
     fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
     consensus_seq = read_protein('alg_ConsensusPAXDomain.txt')
 
-    alignment_matrix = compute_alignment_matrix(human_protein,
-                                                fly_protein,
-                                                scores,
-                                                'local')
-    score, seq_human, seq_fly = compute_local_alignment(human_protein,
-                                                        fly_protein,
-                                                        scores,
-                                                        alignment_matrix)
+    score, seq_human, seq_fly = ALIGNMENT_CACHE.align(human_protein,
+                                                      fly_protein,
+                                                      scores,
+                                                      'local')
     alignment_matrix2 = compute_alignment_matrix(seq_human.replace('-', ''),
                                                  consensus_seq,
                                                  scores,
@@ -115,43 +113,79 @@ def consensus_alignment():
     print(string_compare(local_fly_consensus[1], local_fly_consensus[2]))
 
 
-def generate_null_distribution(seq_x, seq_y, scoring_matrix, num_trials):
+def generate_null_distribution(seq_x, seq_y, scoring_matrix, num_trials,
+                               rng=None):
     """
     Input: two sequences 'seq_x' and 'seq_y', a 'scoring_matrix', and a number
     of trials 'num_trials'.
 
     Returns a dictionary 'scoring_distribution' that represents an
     un-normalized distribution via monte carlo simulation.
+
+    'rng' is an optional random.Random instance used to shuffle 'seq_y'. By
+    default the global state of the random module is used.
     """
     scoring_distribution = {}
     rand_list = list(seq_y)
+    shuffle_list = shuffle if rng is None else rng.shuffle
+    profile = compile_scoring_matrix(scoring_matrix).profile(seq_x)
 
     for _ in range(num_trials):
-        shuffle(rand_list)
+        shuffle_list(rand_list)
         rand_y = ''.join(rand_list)
-        alignment_matrix = compute_alignment_matrix(seq_x,
-                                                    rand_y,
-                                                    scoring_matrix,
-                                                    'local')
-        score, *rest = compute_local_alignment(seq_x,
-                                               rand_y,
-                                               scoring_matrix,
-                                               alignment_matrix)
+        score, *rest = compute_profile_score(profile, rand_y, 'local')
         scoring_distribution[score] = scoring_distribution.get(score, 0) + 1
 
     return scoring_distribution
 
 
+def _null_distribution_chunk(args):
+    """Run one chunk of trials of generate_null_distribution_parallel."""
+    seq_x, seq_y, scoring_matrix, num_trials, chunk_seed = args
+    return generate_null_distribution(seq_x, seq_y, scoring_matrix,
+                                      num_trials, Random(chunk_seed))
+
+
+def generate_null_distribution_parallel(seq_x, seq_y, scoring_matrix,
+                                        num_trials, seed=0, processes=None,
+                                        chunk_size=50):
+    """
+    Input: two sequences 'seq_x' and 'seq_y', a 'scoring_matrix', and a number
+    of trials 'num_trials'.
+
+    Return the same kind of dictionary as generate_null_distribution, with
+    the trials spread over a pool of 'processes' worker processes (by default
+    one per core) in chunks of 'chunk_size' trials.
+
+    Every chunk shuffles with its own random.Random seeded from 'seed' and the
+    chunk number, and the partial distributions are merged in chunk order, so
+    the result only depends on 'seed' and 'chunk_size', not on the number of
+    processes.
+    """
+    chunks = [(seq_x, seq_y, scoring_matrix,
+               min(chunk_size, num_trials - start), '{}:{}'.format(seed, k))
+              for k, start in enumerate(range(0, num_trials, chunk_size))]
+    scoring_distribution = {}
+
+    with Pool(processes) as pool:
+        for partial in pool.imap(_null_distribution_chunk, chunks):
+            for score, count in partial.items():
+                scoring_distribution[score] = \
+                    scoring_distribution.get(score, 0) + count
+
+    return scoring_distribution
+
+
 def make_plot_and_stats():
     """Return a bar plot of the normalized version of score_distribution."""
     scores = read_scoring_matrix('alg_PAM50.txt')
     human_protein = read_protein('alg_HumanEyelessProtein.txt')
     fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
 
-    score_dist = generate_null_distribution(human_protein,
-                                            fly_protein,
-                                            scores,
-                                            1000)
+    score_dist = generate_null_distribution_parallel(human_protein,
+                                                     fly_protein,
+                                                     scores,
+                                                     1000)
     xvals, yvals = [], []
     n = sum(score_dist.values())
 
@@ -169,23 +203,36 @@ def make_plot_and_stats():
     print('Computing basic statistical analysis of this distribution...')
     mu = sum([key*val for key, val in score_dist.items()])/n
     print('The mean is', mu)
-    sigma = sqrt(sum((key-mu)**2 for key in score_dist.keys()
-                                 for _ in range(score_dist[key]))/n)
+    sigma = sqrt(sum(val*(key-mu)**2 for key, val in score_dist.items())/n)
     print('The standard deviation is', sigma)
-    alignment_matrix = compute_alignment_matrix(human_protein,
-                                                fly_protein,
-                                                scores,
-                                                'local')
-    s, *rest = compute_local_alignment(human_protein,
+    s, *rest = compute_alignment_score(human_protein,
                                        fly_protein,
                                        scores,
-                                       alignment_matrix)
+                                       'local')
     z = (s-mu)/sigma
     print('The z-score for the local alignment', s, 'is', z)
 
 
+def human_fruitfly_significance():
+    """
+    Print the significance of the local alignment of the HumanEyelessProtein
+    and FruitflyEyelessProtein sequences, sampling the null distribution only
+    until the p-value of its Gumbel fit is clear.
+    """
+    scores = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    result = alignment_significance(human_protein, fly_protein, scores)
+    print('Trials used:', result.num_trials)
+    print('Gumbel fit: location', result.location, 'scale', result.scale)
+    print('The p-value for the local alignment', result.score, 'is',
+          result.p_value, 'and its z-score is', result.z_score)
+
+
 if __name__ == '__main__':
     human_fruitfly_alignment()
     consensus_alignment()
     # make_plot_and_stats()
+    # human_fruitfly_significance()
     exit()
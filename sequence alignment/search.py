@@ -0,0 +1,113 @@
+"""Streaming search of a query sequence against a FASTA database"""
+
+import heapq
+import os
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from tools import *
+
+_PROFILE = None
+
+
+def read_fasta(filename):
+    """
+    Yield the records of the FASTA file 'filename' one at a time as tuples
+    (name, sequence), where name is the first word of the header line. Only
+    one record is held in memory.
+    """
+    name, lines = None, []
+    with open(filename) as fasta_file:
+        for line in fasta_file:
+            line = line.strip()
+            if line.startswith('>'):
+                if name is not None:
+                    yield (name, ''.join(lines))
+                fields = line[1:].split()
+                name, lines = fields[0] if fields else '', []
+            elif line:
+                lines.append(line)
+    if name is not None:
+        yield (name, ''.join(lines))
+
+
+def _init_worker(profile):
+    """Store the query profile in a worker process of search_database."""
+    global _PROFILE
+    _PROFILE = profile
+
+
+def _score_chunk(sequences):
+    """Return the local alignment scores of the query against 'sequences'."""
+    return [compute_profile_score(_PROFILE, seq, 'local')[0]
+            for seq in sequences]
+
+
+def _chunks(records, chunk_size):
+    """Yield lists of 'chunk_size' (ordinal, name, sequence) records."""
+    records = ((k, name, seq) for k, (name, seq) in enumerate(records))
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def search_database(query, filename, scoring_matrix, k=10, processes=None,
+                    chunk_size=64):
+    """
+    Input: a sequence 'query', the name of a FASTA file 'filename' and a
+    scoring matrix 'scoring_matrix'.
+
+    Return the 'k' best local alignments of 'query' against the records of
+    'filename' as a list of tuples (score, name, align_query, align_record),
+    best first; ties are kept in file order.
+
+    Records are streamed and scored with the score-only profile alignment, in
+    chunks of 'chunk_size' records spread over 'processes' worker processes
+    (by default one per core, processes=1 scores in this process). Only a few
+    chunks are in flight at once and the best hits are kept in a heap of
+    size 'k', so memory does not grow with the size of the database. Full
+    tracebacks are computed only for the 'k' winners.
+    """
+    if k <= 0:
+        return []
+    matrix = compile_scoring_matrix(scoring_matrix)
+    profile = matrix.profile(query)
+    heap = []
+
+    def keep(chunk, scores):
+        for (ordinal, name, seq), score in zip(chunk, scores):
+            item = (score, -ordinal, name, seq)
+            if len(heap) < k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+    chunks = _chunks(read_fasta(filename), chunk_size)
+    if processes == 1:
+        _init_worker(profile)
+        for chunk in chunks:
+            keep(chunk, _score_chunk([seq for _, _, seq in chunk]))
+    else:
+        with Pool(processes, _init_worker, (profile,)) as pool:
+            pending = deque()
+            max_pending = 2 * (processes or os.cpu_count() or 1)
+            for chunk in chunks:
+                pending.append((chunk, pool.apply_async(
+                    _score_chunk, ([seq for _, _, seq in chunk],))))
+                if len(pending) >= max_pending:
+                    chunk, result = pending.popleft()
+                    keep(chunk, result.get())
+            while pending:
+                chunk, result = pending.popleft()
+                keep(chunk, result.get())
+
+    hits = []
+    for score, _, name, seq in sorted(heap, reverse=True):
+        alignment_matrix = compute_alignment_matrix(query, seq, matrix,
+                                                    'local')
+        score, align_query, align_record = compute_local_alignment(
+            query, seq, matrix, alignment_matrix)
+        hits.append((score, name, align_query, align_record))
+    return hits
@@ -0,0 +1,293 @@
+"""Seed-and-extend search in front of the exact local alignment"""
+
+from collections import namedtuple
+from tools import *
+
+NEG_INF = float('-inf')
+
+SeedSearch = namedtuple('SeedSearch', ['hits', 'cells_computed',
+                                       'full_scan_cells'])
+
+
+class KmerIndex:
+    """
+    An index of the positions of every k-mer (substring of length 'k') in
+    one or many target sequences.
+
+    'targets' is a dictionary mapping names to sequences, or a list of
+    sequences, which are then named by their ordinal.
+    """
+
+    def __init__(self, targets, k=3):
+        if not isinstance(targets, dict):
+            targets = {str(ordinal): seq
+                       for ordinal, seq in enumerate(targets)}
+        self.k = k
+        self.targets = targets
+        self.kmers = {}
+        for name, seq in targets.items():
+            for j in range(len(seq) - k + 1):
+                self.kmers.setdefault(seq[j:j+k], []).append((name, j))
+
+    def seeds(self, query):
+        """
+        Yield (name, i, j) for every k-mer shared by 'query', at position i,
+        and the target 'name', at position j.
+        """
+        k = self.k
+        for i in range(len(query) - k + 1):
+            for name, j in self.kmers.get(query[i:i+k], ()):
+                yield (name, i, j)
+
+
+def extend_ungapped(seq_x, seq_y, i, j, length, scoring_matrix, x_drop):
+    """
+    (str, str, int, int, int, dict, int) -> tuple
+
+    Extend the ungapped match of seq_x[i:i+length] and seq_y[j:j+length] in
+    both directions along its diagonal, stopping each way once the score
+    falls more than 'x_drop' below the best score seen (X-drop).
+
+    Return (score, start_x, start_y, length) of the best extension.
+    """
+    return _extend_ungapped(seq_x, seq_y, i, j, length, scoring_matrix,
+                            x_drop)[:4]
+
+
+def _extend_ungapped(seq_x, seq_y, i, j, length, scoring_matrix, x_drop):
+    """
+    Return (score, start_x, start_y, length, steps) as extend_ungapped, with
+    the number of pairs of elements scored.
+    """
+    score = sum(scoring_matrix[seq_x[i+k]][seq_y[j+k]] for k in range(length))
+
+    best, total, right = 0, 0, 0
+    k = 0
+    while i + length + k < len(seq_x) and j + length + k < len(seq_y):
+        total += scoring_matrix[seq_x[i+length+k]][seq_y[j+length+k]]
+        k += 1
+        if total > best:
+            best, right = total, k
+        elif best - total > x_drop:
+            break
+    score += best
+    steps = length + k
+
+    best, total, left = 0, 0, 0
+    k = 0
+    while i - k > 0 and j - k > 0:
+        k += 1
+        total += scoring_matrix[seq_x[i-k]][seq_y[j-k]]
+        if total > best:
+            best, left = total, k
+        elif best - total > x_drop:
+            break
+    score += best
+    steps += k
+
+    return (score, i - left, j - left, left + length + right, steps)
+
+
+def _ungapped_extensions(query, index, matrix, x_drop):
+    """
+    Return (extensions, steps): the (score, name, start_x, start_y, length)
+    of the ungapped extension of every k-mer shared by 'query' and a target
+    of 'index', skipping the seeds that fall on a diagonal stretch already
+    extended, and the number of pairs of elements scored.
+    """
+    extended = {}
+    extensions, steps = [], 0
+    for name, i, j in index.seeds(query):
+        reach = extended.get((name, j - i), -1)
+        if i < reach:
+            continue
+        score, start_x, start_y, length, scored = _extend_ungapped(
+            query, index.targets[name], i, j, index.k, matrix, x_drop)
+        extended[(name, j - i)] = start_x + length
+        extensions.append((score, name, start_x, start_y, length))
+        steps += scored
+    return (extensions, steps)
+
+
+def _xdrop_extension(seq_x, seq_y, matrix, x_drop):
+    """
+    Return (score, align_x, align_y, cells) for the best gapped alignment of
+    a prefix of 'seq_x' with a prefix of 'seq_y' found by X-drop.
+
+    Row by row, only the columns between the first and the last entry of
+    the previous row that was not pruned are computed, plus the columns
+    reached by gaps beyond it; entries more than 'x_drop' below the best
+    score seen so far are pruned. Each row is kept as (first column,
+    values) for the backtrack, which breaks ties like
+    compute_global_alignment.
+    """
+    best, best_i, best_j = 0, 0, 0
+    row = [0]
+    for y in seq_y:
+        value = row[-1] + matrix['-'][y]
+        if value < best - x_drop:
+            break
+        row.append(value)
+    rows, cells = [(0, row)], len(row)
+
+    for i in range(1, len(seq_x) + 1):
+        x = seq_x[i-1]
+        prev_low, prev = rows[-1]
+        prev_high = prev_low + len(prev)
+        dash_x = matrix[x]['-']
+        scores_x = matrix[x]
+        values, new_low = [], None
+        j = prev_low
+        while j <= len(seq_y):
+            up = prev[j - prev_low] + dash_x if j < prev_high else NEG_INF
+            diag = NEG_INF
+            if j > 0 and prev_low <= j - 1 < prev_high:
+                diag = prev[j - 1 - prev_low] + scores_x[seq_y[j-1]]
+            if j > 0 and values:
+                left = values[-1] + matrix['-'][seq_y[j-1]]
+            else:
+                left = NEG_INF
+            value = max(diag, left, up)
+            cells += 1
+            if value < best - x_drop:
+                value = NEG_INF
+                if j >= prev_high:
+                    break
+            elif new_low is None:
+                new_low = j
+            if new_low is not None:
+                values.append(value)
+            j += 1
+
+        while values and values[-1] == NEG_INF:
+            values.pop()
+        if new_low is None or not values:
+            break
+        rows.append((new_low, values))
+        for k, value in enumerate(values):
+            if value > best:
+                best, best_i, best_j = value, i, new_low + k
+
+    def entry(i, j):
+        row_low, values = rows[i]
+        if row_low <= j < row_low + len(values):
+            return values[j - row_low]
+        return NEG_INF
+
+    align_x, align_y = [], []
+    i, j = best_i, best_j
+    while i > 0 or j > 0:
+        value = entry(i, j)
+        if i > 0 and j > 0 and \
+                value == entry(i-1, j-1) + matrix[seq_x[i-1]][seq_y[j-1]]:
+            i -= 1
+            j -= 1
+            align_x.append(seq_x[i])
+            align_y.append(seq_y[j])
+        elif j > 0 and value == entry(i, j-1) + matrix['-'][seq_y[j-1]]:
+            j -= 1
+            align_x.append('-')
+            align_y.append(seq_y[j])
+        else:
+            i -= 1
+            align_x.append(seq_x[i])
+            align_y.append('-')
+
+    return (best, ''.join(reversed(align_x)), ''.join(reversed(align_y)),
+            cells)
+
+
+def compute_xdrop_local_alignment(seq_x, seq_y, scoring_matrix, x_drop,
+                                  seed=None, k=3):
+    """
+    (str, str, dict, int, tuple, int) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return (score, align_x, align_y, cells): a local alignment in the format
+    of compute_local_alignment, found by gapped X-drop extension, and the
+    number of alignment matrix entries evaluated to find it.
+
+    The alignment is extended forward from the pair of positions 'seed' =
+    (i, j), over seq_x[i:] and seq_y[j:], and backward over the reversed
+    seq_x[:i] and seq_y[:j]. In each direction the entries more than
+    'x_drop' below the best score seen so far are pruned, and the range of
+    columns computed on each row shrinks to the entries still alive, so
+    the work follows the similar region instead of the whole matrix. By
+    default the seed is the start of the best ungapped extension
+    (extend_ungapped with the same 'x_drop') of a 'k'-mer shared by both
+    sequences, or (0, 0) if they share none. As in seed_and_extend, seeds
+    on a diagonal stretch already extended are skipped, and the pairs
+    scored by the ungapped extensions are included in 'cells'.
+
+    The result equals compute_local_alignment whenever the optimal local
+    alignment goes through the seed and never drops more than 'x_drop' below
+    its best prefix or suffix score; otherwise it is a lower bound.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    steps = 0
+    if seed is None:
+        seed, best = (0, 0), None
+        extensions, steps = _ungapped_extensions(
+            seq_x, KmerIndex({'y': seq_y}, k), matrix, x_drop)
+        for score, _, start_x, start_y, _ in extensions:
+            if best is None or score > best:
+                seed, best = (start_x, start_y), score
+    i, j = seed
+
+    forward = _xdrop_extension(seq_x[i:], seq_y[j:], matrix, x_drop)
+    backward = _xdrop_extension(seq_x[:i][::-1], seq_y[:j][::-1], matrix,
+                                x_drop)
+    return (forward[0] + backward[0], backward[1][::-1] + forward[1],
+            backward[2][::-1] + forward[2], forward[3] + backward[3] + steps)
+
+
+def seed_and_extend(query, index, scoring_matrix, x_drop=20,
+                    hsp_threshold=50, padding=32):
+    """
+    Input: a sequence 'query', a KmerIndex 'index' over the target sequences
+    and a scoring matrix 'scoring_matrix'.
+
+    Return a SeedSearch tuple (hits, cells_computed, full_scan_cells).
+
+    Every k-mer shared by the query and a target is extended without gaps
+    with extend_ungapped; seeds falling on a diagonal stretch that was already
+    extended are skipped. Each high-scoring pair (HSP) scoring at least
+    'hsp_threshold' and not already covered by a window is then aligned
+    exactly with the local alignment of tools.py, in a window of the query
+    and target extending 'padding' elements beyond the HSP on each side.
+
+    'hits' is the list of the resulting local alignments (score, name,
+    align_query, align_target), best first. 'cells_computed' is the number
+    of alignment matrix entries filled for them, to compare with
+    'full_scan_cells', the number needed to align the query against every
+    target in full.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    extensions, _ = _ungapped_extensions(query, index, matrix, x_drop)
+    hsps = [hsp for hsp in extensions if hsp[0] >= hsp_threshold]
+
+    hits, windows, cells = [], [], 0
+    for score, name, start_x, start_y, length in sorted(
+            hsps, key=lambda hsp: -hsp[0]):
+        if any(window_name == name and
+               x_low <= start_x and start_x + length <= x_high and
+               y_low <= start_y and start_y + length <= y_high
+               for window_name, x_low, x_high, y_low, y_high in windows):
+            continue
+        target = index.targets[name]
+        x_low, x_high = max(0, start_x - padding), \
+            min(len(query), start_x + length + padding)
+        y_low, y_high = max(0, start_y - padding), \
+            min(len(target), start_y + length + padding)
+        windows.append((name, x_low, x_high, y_low, y_high))
+        cells += (x_high - x_low) * (y_high - y_low)
+        score, align_query, align_target = compute_alignment_traceback(
+            query[x_low:x_high], target[y_low:y_high], matrix, 'local')
+        hits.append((score, name, align_query, align_target))
+
+    full_scan_cells = len(query) * sum(len(target)
+                                       for target in index.targets.values())
+    hits.sort(key=lambda hit: -hit[0])
+    return SeedSearch(hits, cells, full_scan_cells)
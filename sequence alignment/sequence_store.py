@@ -0,0 +1,210 @@
+"""Indexed, memory-mapped access to the records of sequence files"""
+
+import mmap
+import os
+
+
+class SequenceStore:
+    """
+    Random access to the records of a FASTA file, or of a plain text file
+    with one sequence per line, without reading the file into memory.
+
+    The file is memory-mapped and described by an index of one line per
+    record in the format of samtools '.fai' files:
+
+        name, length, offset, line_bases, line_width
+
+    separated by tabs, where 'offset' is the byte offset of the first element
+    of the record, 'line_bases' the number of elements per line and
+    'line_width' the number of bytes per line including the line break. The
+    records of a plain text file are named by their ordinal. Records whose
+    lines do not all have the same length (but the last) are stored with
+    line_bases = line_width = 0.
+
+    The index is read from 'index_filename' (by default the name of the file
+    plus '.fai') and only built by scanning the file, then saved, when it is
+    missing or older than the file, so opening a large file only costs
+    loading its index.
+
+    Records are looked up by name or ordinal. store[key] decodes a record to
+    a str, store.get_bytes(key) returns its elements as bytes (a zero-copy
+    memoryview when the record is on one line) and store.view(key) is a
+    zero-copy memoryview of its bytes including line breaks.
+    """
+
+    def __init__(self, filename, index_filename=None):
+        self.filename = filename
+        self.index_filename = index_filename or filename + '.fai'
+        self._file = open(filename, 'rb')
+        if os.path.getsize(filename) > 0:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        else:
+            self._map = b''
+
+        if self._index_is_fresh():
+            self._index = self._load_index()
+        else:
+            self._index = self._build_index()
+            self._save_index()
+        self._ordinals = {entry[0]: k for k, entry in enumerate(self._index)}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the memory map and the file."""
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name):
+        return name in self._ordinals
+
+    def __getitem__(self, key):
+        return bytes(self.get_bytes(key)).decode('ascii')
+
+    def names(self):
+        """Return the names of the records in file order."""
+        return [entry[0] for entry in self._index]
+
+    def length(self, key):
+        """Return the number of elements of the record 'key'."""
+        return self._entry(key)[1]
+
+    def view(self, key):
+        """
+        Return a memoryview of the bytes of the record 'key' in the mapped
+        file, line breaks included.
+        """
+        name, length, offset, line_bases, line_width = self._entry(key)
+        if length == 0:
+            end = offset
+        elif line_bases == 0:
+            end = self._map.find(b'\n>', offset)
+            end = len(self._map) if end < 0 else end
+        else:
+            end = offset + (length - 1) // line_bases * line_width + \
+                (length - 1) % line_bases + 1
+        return memoryview(self._map)[offset:end]
+
+    def get_bytes(self, key):
+        """
+        Return the elements of the record 'key' as bytes. Records on a single
+        line are returned as a zero-copy memoryview of the mapped file.
+        """
+        name, length, offset, line_bases, line_width = self._entry(key)
+        if line_bases == length:
+            return memoryview(self._map)[offset:offset + length]
+        return b''.join(bytes(self.view(key)).split())
+
+    def fetch(self, key, start, end):
+        """
+        Return the elements start:end of the record 'key' as a str, only
+        touching the lines that hold them.
+        """
+        name, length, offset, line_bases, line_width = self._entry(key)
+        start, end, _ = slice(start, end).indices(length)
+        if start >= end:
+            return ''
+        if line_bases == 0:
+            return self[key][start:end]
+        first = offset + start // line_bases * line_width + start % line_bases
+        last = offset + (end - 1) // line_bases * line_width + \
+            (end - 1) % line_bases
+        return b''.join(self._map[first:last + 1].split()).decode('ascii')
+
+    def _entry(self, key):
+        if isinstance(key, str):
+            key = self._ordinals[key]
+        return self._index[key]
+
+    def _index_is_fresh(self):
+        return (os.path.exists(self.index_filename) and
+                os.path.getmtime(self.index_filename) >=
+                os.path.getmtime(self.filename))
+
+    def _load_index(self):
+        index = []
+        with open(self.index_filename) as index_file:
+            for line in index_file:
+                name, *numbers = line.rstrip('\n').split('\t')
+                index.append((name, *map(int, numbers)))
+        return index
+
+    def _save_index(self):
+        try:
+            with open(self.index_filename, 'w') as index_file:
+                for entry in self._index:
+                    index_file.write('\t'.join(map(str, entry)) + '\n')
+        except OSError:
+            pass
+
+    def _lines(self):
+        """Yield (start, end, next_start) for every line of the file."""
+        data, size = self._map, len(self._map)
+        start = 0
+        while start < size:
+            end = data.find(b'\n', start)
+            next_start = size if end < 0 else end + 1
+            end = size if end < 0 else end
+            yield (start, end, next_start)
+            start = next_start
+
+    def _build_index(self):
+        data = self._map
+        stripped = bytes(data[:64]).lstrip()
+        if not stripped.startswith(b'>'):
+            index = []
+            for start, end, next_start in self._lines():
+                length = len(data[start:end].rstrip())
+                if length:
+                    index.append((str(len(index)), length, start, length,
+                                  next_start - start))
+            return index
+
+        # name, offset, length, (bases, width) of the first line, (bases,
+        # width, start) of the previous line and whether the lines are
+        # ragged, kept while scanning so memory does not grow with the
+        # number of lines of a record
+        index, record = [], None
+
+        def finish(record):
+            name, offset, length, first, previous, ragged = record
+            if length == 0:
+                index.append((name, 0, offset, 0, 0))
+            elif not ragged and previous[0] <= first[0]:
+                index.append((name, length, offset, first[0], first[1]))
+            else:
+                index.append((name, length, offset, 0, 0))
+
+        for start, end, next_start in self._lines():
+            line = data[start:end]
+            if line.startswith(b'>'):
+                if record is not None:
+                    finish(record)
+                fields = line[1:].split()
+                name = fields[0].decode('ascii') if fields else ''
+                record = [name, next_start, 0, None, None, False]
+            elif record is not None:
+                bases = len(line.rstrip())
+                if not bases:
+                    continue
+                previous = record[4]
+                if previous is None:
+                    record[1] = start
+                    record[3] = (bases, next_start - start)
+                elif previous[:2] != record[3] or \
+                        previous[2] + previous[1] != start:
+                    record[5] = True
+                record[2] += bases
+                record[4] = (bases, next_start - start, start)
+        if record is not None:
+            finish(record)
+        return index
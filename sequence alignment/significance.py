@@ -0,0 +1,101 @@
+"""Adaptive monte carlo significance of local alignment scores"""
+
+from collections import namedtuple
+from math import exp, expm1, pi, sqrt
+from random import Random
+from statistics import NormalDist
+from tools import *
+
+EULER_GAMMA = 0.5772156649015329
+
+# Excess kurtosis of the Gumbel distribution, used for the standard error of
+# the sample standard deviation.
+GUMBEL_KURTOSIS = 2.4
+
+Significance = namedtuple('Significance', ['score', 'p_value', 'z_score',
+                                           'num_trials', 'location', 'scale',
+                                           'mean', 'std', 'significant'])
+
+
+def gumbel_sf(score, location, scale):
+    """
+    (float, float, float) -> float
+
+    Return P(S >= score) for S following a Gumbel (type I extreme value)
+    distribution with parameters 'location' and 'scale'.
+    """
+    t = (score - location) / scale
+    if t < -700:
+        return 1.0
+    return -expm1(-exp(-t))
+
+
+def gumbel_fit(mean, std):
+    """
+    (float, float) -> tuple
+
+    Return the (location, scale) of the Gumbel distribution with the given
+    'mean' and standard deviation 'std' (method of moments).
+    """
+    scale = max(std, 1e-12) * sqrt(6) / pi
+    return (mean - EULER_GAMMA * scale, scale)
+
+
+def alignment_significance(seq_x, seq_y, scoring_matrix, alpha=0.01,
+                           confidence=0.99, min_trials=10, max_trials=1000,
+                           batch_size=10, seed=0):
+    """
+    Input: two sequences 'seq_x' and 'seq_y' and a 'scoring_matrix'.
+
+    Return a Significance tuple for the local alignment score of 'seq_x' and
+    'seq_y' against the null distribution of the scores of 'seq_x' against
+    shuffled copies of 'seq_y', which is modeled by a Gumbel distribution.
+
+    The mean and variance of the null scores are updated after every trial
+    (Welford's method) and the Gumbel parameters refitted by the method of
+    moments. After 'min_trials', and then every 'batch_size' trials, the
+    p-value is computed with the fitted parameters moved by their standard
+    errors, at the 'confidence' level, in both directions. Sampling stops as
+    soon as the whole range is below 'alpha' (significant) or above it (not
+    significant), or after 'max_trials'.
+
+    The tuple holds the score, the p-value and z-score of the fit, the number
+    of trials used, the Gumbel 'location' and 'scale', the mean and standard
+    deviation of the null scores and whether the p-value is below 'alpha'.
+    """
+    matrix = compile_scoring_matrix(scoring_matrix)
+    profile = matrix.profile(seq_x)
+    score = compute_profile_score(profile, seq_y, 'local')[0]
+    z_crit = NormalDist().inv_cdf(confidence)
+    min_trials = max(min_trials, 2)
+    rng = Random(seed)
+    rand_list = list(seq_y)
+
+    count, mean, m2 = 0, 0.0, 0.0
+    while count < max_trials:
+        rng.shuffle(rand_list)
+        null_score = compute_profile_score(profile, ''.join(rand_list),
+                                           'local')[0]
+        count += 1
+        delta = null_score - mean
+        mean += delta / count
+        m2 += delta * (null_score - mean)
+
+        if count < min_trials or (count - min_trials) % batch_size:
+            continue
+        std = sqrt(m2 / (count - 1))
+        mean_error = z_crit * std / sqrt(count)
+        std_error = z_crit * std * sqrt((GUMBEL_KURTOSIS + 2) / (4 * count))
+        p_high = gumbel_sf(score, *gumbel_fit(mean + mean_error,
+                                              std + std_error))
+        p_low = gumbel_sf(score, *gumbel_fit(mean - mean_error,
+                                             max(std - std_error, 0)))
+        if p_high < alpha or p_low > alpha:
+            break
+
+    std = sqrt(m2 / (count - 1)) if count > 1 else 0.0
+    location, scale = gumbel_fit(mean, std)
+    p_value = gumbel_sf(score, location, scale)
+    z_score = (score - mean) / std if std else float('inf')
+    return Significance(score, p_value, z_score, count, location, scale,
+                        mean, std, p_value < alpha)
@@ -0,0 +1,271 @@
+"""Tiled wavefront alignment of long sequences over several processes"""
+
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from tools import *
+from vectorized import dense_scoring_matrix, encode
+
+# State of the tiled fill in this process, see _init_worker
+_STATE = {}
+
+
+def _cuts(length, tile):
+    """
+    (int, int) -> list
+
+    Return the boundaries [0, tile, 2*tile, ..., length] of the tiles along
+    a sequence of 'length' elements.
+    """
+    return list(range(0, length, tile)) + [length] if length else [0]
+
+
+def _init_worker(state, boundaries):
+    """
+    Store the 'state' shared by the tiles of a fill in this process, with the
+    boundary arrays 'rows' and 'cols' taken from 'boundaries': either the
+    arrays themselves or the (name, shape) of the shared memory holding them.
+    """
+    _STATE.clear()
+    _STATE.update(state)
+    for key, boundary in boundaries.items():
+        if isinstance(boundary, np.ndarray):
+            _STATE[key] = boundary
+        else:
+            name, shape = boundary
+            memory = shared_memory.SharedMemory(name=name)
+            _STATE[key + '_memory'] = memory
+            _STATE[key] = np.ndarray(shape, dtype=np.int64,
+                                     buffer=memory.buf)
+
+
+def _fill_tile(r, c, keep=False):
+    """
+    Fill the tile (r, c) of the alignment matrix from the boundary row above
+    it and the boundary column to its left.
+
+    Return (bottom, right, best, tile): the last row and last column of the
+    tile, the first (value, i, j) of its largest interior entry for local
+    alignments (else None), and, if 'keep', the whole tile as an ndarray
+    whose entry [0][0] is the entry (x_cuts[r], y_cuts[c]) of the matrix.
+    """
+    state = _STATE
+    i_low, i_high = state['x_cuts'][r], state['x_cuts'][r+1]
+    j_low, j_high = state['y_cuts'][c], state['y_cuts'][c+1]
+    x_codes, gap_x, local = state['x_codes'], state['gap_x'], state['local']
+    profile = state['profile'][:, j_low:j_high]
+    gap_sums = state['gap_sums'][j_low:j_high+1]
+    left = state['cols'][c, i_low:i_high+1]
+
+    row = state['rows'][r, j_low:j_high+1].copy()
+    right = np.empty(i_high - i_low + 1, dtype=np.int64)
+    right[0] = row[-1]
+    tile = [row] if keep else None
+    best = None
+    for k in range(1, i_high - i_low + 1):
+        x = x_codes[i_low + k - 1]
+        moves = row + gap_x[i_low + k - 1]
+        np.maximum(moves[1:], row[:-1] + profile[x], out=moves[1:])
+        if local:
+            np.maximum(moves, 0, out=moves)
+        moves[0] = left[k]
+        np.subtract(moves, gap_sums, out=moves)
+        np.maximum.accumulate(moves, out=moves)
+        row = moves + gap_sums
+        right[k] = row[-1]
+        if local and len(row) > 1:
+            j = int(np.argmax(row[1:]))
+            if best is None or row[j+1] > best[0]:
+                best = (int(row[j+1]), i_low + k, j_low + j + 1)
+        if keep:
+            tile.append(row)
+
+    return (row, right, best, np.array(tile) if keep else None)
+
+
+def _fill_task(tile):
+    """Fill one tile of a wavefront and store its last row and column."""
+    r, c = tile
+    bottom, right, best, _ = _fill_tile(r, c)
+    state = _STATE
+    state['rows'][r+1, state['y_cuts'][c]:state['y_cuts'][c+1]+1] = bottom
+    state['cols'][c+1, state['x_cuts'][r]:state['x_cuts'][r+1]+1] = right
+    return best
+
+
+def _wavefront(seq_x, seq_y, scoring_matrix, alignment, tile, processes):
+    """
+    Fill the alignment matrix of 'seq_x' and 'seq_y' tile by tile, one
+    anti-diagonal of tiles at a time.
+
+    Return (state, best) where state['rows'][r] is the row x_cuts[r] of the
+    alignment matrix, state['cols'][c] its column y_cuts[c], and 'best' the
+    first (value, i, j) of the largest entry for local alignments.
+    """
+    codes, scores = dense_scoring_matrix(scoring_matrix)
+    dash = codes['-']
+    x_codes, y_codes = encode(seq_x, codes), encode(seq_y, codes)
+    x_length, y_length = len(seq_x), len(seq_y)
+    local = alignment == 'local'
+    gap_sums = np.cumsum(np.concatenate(([0], scores[dash, y_codes])))
+    gap_x_sums = np.cumsum(np.concatenate(([0], scores[x_codes, dash])))
+    state = {'x_cuts': _cuts(x_length, tile), 'y_cuts': _cuts(y_length, tile),
+             'x_codes': x_codes, 'gap_x': scores[x_codes, dash],
+             'profile': scores[:, y_codes], 'gap_sums': gap_sums,
+             'local': local}
+    row_count, col_count = len(state['x_cuts']), len(state['y_cuts'])
+
+    first_row, first_col = gap_sums, gap_x_sums
+    if local:
+        first_row = gap_sums + np.maximum.accumulate(-gap_sums)
+        first_col = gap_x_sums + np.maximum.accumulate(-gap_x_sums)
+    j = int(np.argmax(first_row))
+    i = int(np.argmax(first_col))
+    candidates = [(int(first_row[j]), 0, j), (int(first_col[i]), i, 0)]
+
+    tiles = [[(r, d - r) for r in range(row_count - 1)
+              if 0 <= d - r < col_count - 1]
+             for d in range(row_count + col_count - 3)]
+    shapes = {'rows': (row_count, y_length + 1),
+              'cols': (col_count, x_length + 1)}
+
+    def start(arrays):
+        arrays['rows'][0], arrays['cols'][0] = first_row, first_col
+        arrays['rows'][:, 0] = first_col[state['x_cuts']]
+        arrays['cols'][:, 0] = first_row[state['y_cuts']]
+
+    if processes == 1 or all(len(diagonal) <= 1 for diagonal in tiles):
+        boundaries = {key: np.empty(shape, dtype=np.int64)
+                      for key, shape in shapes.items()}
+        start(boundaries)
+        _init_worker(state, boundaries)
+        for diagonal in tiles:
+            candidates.extend(_fill_task(tile) for tile in diagonal)
+        state.update(boundaries)
+        return (state, _best_entry(candidates))
+
+    memories = {key: shared_memory.SharedMemory(
+        create=True, size=max(8, 8 * shape[0] * shape[1]))
+        for key, shape in shapes.items()}
+    arrays = {}
+    try:
+        arrays.update({key: np.ndarray(shapes[key], dtype=np.int64,
+                                       buffer=memory.buf)
+                       for key, memory in memories.items()})
+        start(arrays)
+        boundaries = {key: (memory.name, shapes[key])
+                      for key, memory in memories.items()}
+        with Pool(processes, _init_worker, (state, boundaries)) as pool:
+            for diagonal in tiles:
+                candidates.extend(pool.map(_fill_task, diagonal))
+        state.update({key: array.copy() for key, array in arrays.items()})
+    finally:
+        arrays.clear()
+        for memory in memories.values():
+            memory.close()
+            memory.unlink()
+    return (state, _best_entry(candidates))
+
+
+def _best_entry(candidates):
+    """
+    Return the largest (value, i, j) of 'candidates', the first one in row
+    major order among equals, as found by max_entry.
+    """
+    return min((candidate for candidate in candidates
+                if candidate is not None),
+               key=lambda candidate: (-candidate[0], candidate[1],
+                                      candidate[2]))
+
+
+def compute_tiled_alignment_score(seq_x, seq_y, scoring_matrix,
+                                  alignment='global', tile=2048,
+                                  processes=None):
+    """
+    (str, str, dict, str, int, int) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return the same (score, i, j) as compute_alignment_score.
+
+    The alignment matrix is split into tiles of 'tile' x 'tile' entries. The
+    tiles on one anti-diagonal only depend on the tiles of the previous one,
+    so they are filled in parallel by a pool of 'processes' worker processes
+    (by default one per core, processes=1 fills in this process), each with
+    whole-row NumPy operations as in vectorized.py. Only the last row and
+    last column of every tile are kept, in shared memory, where the tiles
+    below and to the right read them.
+    """
+    state, best = _wavefront(seq_x, seq_y, scoring_matrix, alignment, tile,
+                             processes)
+    if alignment == 'local':
+        return best
+    return (int(state['rows'][-1][-1]), len(seq_x), len(seq_y))
+
+
+def compute_tiled_alignment(seq_x, seq_y, scoring_matrix, alignment='global',
+                            tile=2048, processes=None):
+    """
+    (str, str, dict, str, int, int) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return the same (score, align_x, align_y) as compute_global_alignment or
+    compute_local_alignment applied to compute_alignment_matrix(seq_x, seq_y,
+    scoring_matrix, alignment).
+
+    The matrix is filled as in compute_tiled_alignment_score, keeping the
+    rows and columns on the tile boundaries as checkpoints. The backtrack
+    then recomputes the tiles it crosses one at a time from their
+    checkpoints, so at most one tile of the matrix is held at once.
+    """
+    state, best = _wavefront(seq_x, seq_y, scoring_matrix, alignment, tile,
+                             processes)
+    _init_worker(state, {'rows': state['rows'], 'cols': state['cols']})
+    matrix = compile_scoring_matrix(scoring_matrix)
+    local = alignment == 'local'
+    if local:
+        score, i, j = best
+    else:
+        score, i, j = int(state['rows'][-1][-1]), len(seq_x), len(seq_y)
+
+    align_x, align_y = [], []
+    while i > 0 and j > 0:
+        r, c = (i - 1) // tile, (j - 1) // tile
+        i_low, j_low = state['x_cuts'][r], state['y_cuts'][c]
+        current = _fill_tile(r, c, keep=True)[3]
+        while i > i_low and j > j_low:
+            value = current[i - i_low][j - j_low]
+            if local and value <= 0:
+                break
+            if value == current[i - i_low - 1][j - j_low - 1] + \
+                    matrix[seq_x[i-1]][seq_y[j-1]]:
+                align_x.append(seq_x[i-1])
+                align_y.append(seq_y[j-1])
+                i -= 1
+                j -= 1
+            elif value == current[i - i_low][j - j_low - 1] + \
+                    matrix['-'][seq_y[j-1]]:
+                align_x.append('-')
+                align_y.append(seq_y[j-1])
+                j -= 1
+            else:
+                align_x.append(seq_x[i-1])
+                align_y.append('-')
+                i -= 1
+        else:
+            continue
+        break
+
+    if not local:
+        while i > 0:
+            align_x.append(seq_x[i-1])
+            align_y.append('-')
+            i -= 1
+        while j > 0:
+            align_x.append('-')
+            align_y.append(seq_y[j-1])
+            j -= 1
+
+    return (score, ''.join(reversed(align_x)), ''.join(reversed(align_y)))
@@ -1,5 +1,10 @@
 """Basic analytic tools for aligning sequences"""
 
+import math
+import sys
+from collections import namedtuple
+from time import perf_counter
+
 
 def build_scoring_matrix(alphabet, diag_score, off_diag_score, dash_score):
     """
@@ -28,6 +33,205 @@ def build_scoring_matrix(alphabet, diag_score, off_diag_score, dash_score):
     return {row: {col: score(row, col) for col in symbols} for row in symbols}
 
 
+class ScoringMatrix:
+    """
+    A scoring matrix compiled for fast lookups.
+
+    The symbols of the matrix (the alphabet plus '-') are mapped to the small
+    integer codes in 'codes' and the scores are stored row by row in the flat
+    list 'scores', so that the score of the pair of codes (a, b) is
+    scores[a * size + b]. 'rows[a]' is the slice of 'scores' for code a.
+
+    Indexing with symbols, matrix[x][y], behaves like the dictionary of
+    dictionaries the matrix was compiled from, so a ScoringMatrix can be
+    passed wherever such a dictionary is expected.
+    """
+
+    def __init__(self, scoring_matrix):
+        self.symbols = tuple(sorted(scoring_matrix))
+        self.codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self.size = len(self.symbols)
+        self.dash = self.codes['-']
+        self.scores = [scoring_matrix[row][col]
+                       for row in self.symbols for col in self.symbols]
+        self.rows = [self.scores[code*self.size:(code+1)*self.size]
+                     for code in range(self.size)]
+        self._dict = {row: {col: self.rows[self.codes[row]][self.codes[col]]
+                            for col in self.symbols}
+                      for row in self.symbols}
+
+    def __getitem__(self, symbol):
+        return self._dict[symbol]
+
+    def __iter__(self):
+        return iter(self._dict)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, symbol):
+        return symbol in self._dict
+
+    def keys(self):
+        return self._dict.keys()
+
+    def encode(self, seq):
+        """
+        str -> list
+
+        Return 'seq' as a list of integer codes.
+        """
+        codes = self.codes
+        return [codes[elem] for elem in seq]
+
+    def transpose(self):
+        """
+        Return the compiled matrix with rows and columns exchanged.
+        """
+        return ScoringMatrix(transpose_scoring_matrix(self._dict))
+
+    def profile(self, query):
+        """
+        str -> Profile
+
+        Return the profile of the sequence 'query', to be reused when
+        aligning it against many other sequences.
+        """
+        return Profile(self, query)
+
+
+class Profile:
+    """
+    The scores of a fixed query sequence against every symbol.
+
+    'rows[code][i]' is the score of the pair (query[i], symbol with 'code'),
+    so aligning the query against a target only needs one list lookup per
+    target element, plus 'gaps[code]', the score of ('-', symbol with
+    'code').
+    """
+
+    def __init__(self, scoring_matrix, query):
+        self.scoring_matrix = compile_scoring_matrix(scoring_matrix)
+        self.query = query
+        matrix = self.scoring_matrix
+        query_rows = [matrix.rows[code] for code in matrix.encode(query)]
+        self.rows = [[row[code] for row in query_rows]
+                     for code in range(matrix.size)]
+        self.gaps = matrix.rows[matrix.dash]
+
+
+def compile_scoring_matrix(scoring_matrix):
+    """
+    dict -> ScoringMatrix
+
+    Return 'scoring_matrix' compiled into a ScoringMatrix. A ScoringMatrix is
+    returned unchanged.
+    """
+    if isinstance(scoring_matrix, ScoringMatrix):
+        return scoring_matrix
+    return ScoringMatrix(scoring_matrix)
+
+
+CallStats = namedtuple('CallStats', ['function', 'cells', 'phases',
+                                     'peak_bytes', 'seconds', 'gcups'])
+
+# Instrumentation objects currently recording, see Instrumentation
+_OBSERVERS = []
+
+
+class Instrumentation:
+    """
+    A context manager recording the work done by the alignment functions of
+    this module while it is active:
+
+        with Instrumentation() as probe:
+            compute_alignment_traceback(seq_x, seq_y, scoring_matrix)
+        probe.calls  # [CallStats(...)]
+
+    Every call appends a CallStats tuple to 'calls', and is passed to
+    'callback' if one is given, with the name of the 'function', the number
+    of matrix entries it computed or visited ('cells'), a dictionary of the
+    wall time in seconds of each of its 'phases' (such as 'allocate',
+    'fill', 'max_entry' and 'traceback'), the bytes of the largest matrix
+    storage it held ('peak_bytes': the lists and bytearrays and the numbers
+    the lists hold, small integers shared by Python included), the total
+    'seconds' and the resulting billions of cell updates per second
+    ('gcups').
+
+    When no Instrumentation is active, the functions only test an empty list
+    once per phase, so the fills run at full speed.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.calls = []
+
+    def __enter__(self):
+        _OBSERVERS.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _OBSERVERS.remove(self)
+
+    def record(self, stats):
+        """Keep the CallStats 'stats' and pass it to the callback."""
+        self.calls.append(stats)
+        if self.callback is not None:
+            self.callback(stats)
+
+
+def _report(function, cells, phases, peak_bytes):
+    """Send the CallStats of a call to every active Instrumentation."""
+    seconds = sum(phases.values())
+    stats = CallStats(function, cells, phases, peak_bytes, seconds,
+                      cells / seconds / 1e9 if seconds else 0.0)
+    for observer in list(_OBSERVERS):
+        observer.record(stats)
+
+
+class _Nested(Instrumentation):
+    """
+    Collect the calls made by an instrumented function instead of
+    reporting them, so that the function reports their work once as its own.
+    Nothing is collected when no Instrumentation is active.
+    """
+
+    def __enter__(self):
+        self.outer = _OBSERVERS[:]
+        if self.outer:
+            _OBSERVERS[:] = [self]
+        return self
+
+    def __exit__(self, *args):
+        if self.outer:
+            _OBSERVERS[:] = self.outer
+
+
+def _merge_phases(calls, phases=None):
+    """Add up the phases of 'calls' into the dictionary 'phases'."""
+    phases = {} if phases is None else phases
+    for stats in calls:
+        for phase, seconds in stats.phases.items():
+            phases[phase] = phases.get(phase, 0.0) + seconds
+    return phases
+
+
+def _list_bytes(*lists):
+    """
+    Return the bytes held by lists, by the lists they contain and by their
+    other elements.
+    """
+    total = 0
+    for items in lists:
+        total += sys.getsizeof(items)
+        for item in items:
+            if isinstance(item, list):
+                total += _list_bytes(item)
+            else:
+                total += sys.getsizeof(item)
+    return total
+
+
 def compute_alignment_matrix(seq_x, seq_y, scoring_matrix, alignment='global'):
     """
     (str, str, dict, str) -> dict
@@ -40,40 +244,63 @@ def compute_alignment_matrix(seq_x, seq_y, scoring_matrix, alignment='global'):
     'alignment' can be set to 'global' or 'local' and specifies the method to
     compute the alignment matrix used to solve the Global or Local Pairwise
     Alignment Problem, respectively.
+
+    'scoring_matrix' can be a dictionary of dictionaries or a ScoringMatrix;
+    the matrix is filled using its integer codes either way.
     """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    matrix = compile_scoring_matrix(scoring_matrix)
+    x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+    dash_row = matrix.rows[matrix.dash]
     x_length, y_length = len(seq_x), len(seq_y)
     alignment_matrix = [[0 for col in range(y_length + 1)] for row in range(x_length + 1)]
+    if observed:
+        allocated = perf_counter()
 
     if alignment == 'global':
         for i in range(1, x_length+1):
             alignment_matrix[i][0] = alignment_matrix[i-1][0] + \
-                                    scoring_matrix[seq_x[i-1]]['-']
+                                    matrix.rows[x_codes[i-1]][matrix.dash]
         for j in range(1, y_length+1):
             alignment_matrix[0][j] = alignment_matrix[0][j-1] + \
-                                    scoring_matrix['-'][seq_y[j-1]]
+                                    dash_row[y_codes[j-1]]
         for i in range(1, x_length+1):
+            prev, row = alignment_matrix[i-1], alignment_matrix[i]
+            scores_x = matrix.rows[x_codes[i-1]]
+            dash_x = scores_x[matrix.dash]
             for j in range(1, y_length+1):
-                x, y = seq_x[i-1], seq_y[j-1]
-                s1 = alignment_matrix[i-1][j-1] + scoring_matrix[x][y]
-                s2 = alignment_matrix[i][j-1] + scoring_matrix['-'][y]
-                s3 = alignment_matrix[i-1][j] + scoring_matrix[x]['-']
-                alignment_matrix[i][j] = max(s1, s2, s3)
+                y = y_codes[j-1]
+                s1 = prev[j-1] + scores_x[y]
+                s2 = row[j-1] + dash_row[y]
+                s3 = prev[j] + dash_x
+                row[j] = max(s1, s2, s3)
 
     elif alignment == 'local':
         for i in range(1, x_length+1):
-            alignment_matrix[i][0] = max(0, alignment_matrix[i-1][0] +
-                                         scoring_matrix[seq_x[i-1]]['-'])
+            alignment_matrix[i][0] = max(
+                0, alignment_matrix[i-1][0] +
+                matrix.rows[x_codes[i-1]][matrix.dash])
         for j in range(1, y_length+1):
             alignment_matrix[0][j] = max(0, alignment_matrix[0][j-1] +
-                                         scoring_matrix['-'][seq_y[j-1]])
+                                         dash_row[y_codes[j-1]])
         for i in range(1, x_length+1):
+            prev, row = alignment_matrix[i-1], alignment_matrix[i]
+            scores_x = matrix.rows[x_codes[i-1]]
+            dash_x = scores_x[matrix.dash]
             for j in range(1, y_length+1):
-                x, y = seq_x[i-1], seq_y[j-1]
-                s1 = alignment_matrix[i-1][j-1] + scoring_matrix[x][y]
-                s2 = alignment_matrix[i][j-1] + scoring_matrix['-'][y]
-                s3 = alignment_matrix[i-1][j] + scoring_matrix[x]['-']
-                alignment_matrix[i][j] = max(0, s1, s2, s3)
+                y = y_codes[j-1]
+                s1 = prev[j-1] + scores_x[y]
+                s2 = row[j-1] + dash_row[y]
+                s3 = prev[j] + dash_x
+                row[j] = max(0, s1, s2, s3)
 
+    if observed:
+        _report('compute_alignment_matrix', x_length * y_length,
+                {'allocate': allocated - start,
+                 'fill': perf_counter() - allocated},
+                _list_bytes(alignment_matrix))
     return alignment_matrix
 
 
@@ -89,38 +316,506 @@ def compute_global_alignment(seq_x, seq_y, scoring_matrix, alignment_matrix):
     (score, align_x, align_y) where score is the score of the global alignment
     'align_x' and 'align_y'.
     """
-    align_x, align_y = '', ''
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    align_x, align_y = [], []
     i, j = len(seq_x), len(seq_y)
 
     while i > 0 and j > 0:
         if alignment_matrix[i][j] == alignment_matrix[i-1][j-1] + \
                                     scoring_matrix[seq_x[i-1]][seq_y[j-1]]:
-            align_x = seq_x[i-1] + align_x
-            align_y = seq_y[j-1] + align_y
+            align_x.append(seq_x[i-1])
+            align_y.append(seq_y[j-1])
             i -= 1
             j -= 1
         elif alignment_matrix[i][j] == alignment_matrix[i][j-1] + \
                                       scoring_matrix['-'][seq_y[j-1]]:
-            align_x = '-' + align_x
-            align_y = seq_y[j-1] + align_y
+            align_x.append('-')
+            align_y.append(seq_y[j-1])
             j -= 1
         else:
-            align_x = seq_x[i-1] + align_x
-            align_y = '-' + align_y
+            align_x.append(seq_x[i-1])
+            align_y.append('-')
             i -= 1
 
     while i > 0:
-        align_x = seq_x[i-1] + align_x
-        align_y = '-' + align_y
+        align_x.append(seq_x[i-1])
+        align_y.append('-')
         i -= 1
     while j > 0:
-        align_x = '-' + align_x
-        align_y = seq_y[j-1] + align_y
+        align_x.append('-')
+        align_y.append(seq_y[j-1])
         j -= 1
 
+    align_x, align_y = ''.join(reversed(align_x)), ''.join(reversed(align_y))
+    if observed:
+        _report('compute_global_alignment', len(align_x),
+                {'traceback': perf_counter() - start}, 0)
     return (alignment_matrix[len(seq_x)][len(seq_y)], align_x, align_y)
 
 
+def transpose_scoring_matrix(scoring_matrix):
+    """
+    dict -> dict
+
+    Return the scoring matrix with rows and columns exchanged, i.e. the matrix
+    to use when the roles of 'seq_x' and 'seq_y' are swapped.
+    """
+    return {col: {row: scoring_matrix[row][col] for row in scoring_matrix}
+            for col in scoring_matrix[next(iter(scoring_matrix))]}
+
+
+def global_last_row(seq_x, seq_y, scoring_matrix):
+    """
+    (str, str, dict) -> list
+
+    Return the last row of the global alignment matrix for 'seq_x' and
+    'seq_y', i.e. the scores of the optimal global alignments of 'seq_x'
+    against every prefix of 'seq_y'. Only two rows are kept in memory.
+    """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    matrix = compile_scoring_matrix(scoring_matrix)
+    y_codes = matrix.encode(seq_y)
+    dash_row = matrix.rows[matrix.dash]
+    row = [0] * (len(seq_y) + 1)
+    for j in range(1, len(seq_y)+1):
+        row[j] = row[j-1] + dash_row[y_codes[j-1]]
+
+    for x in matrix.encode(seq_x):
+        scores_x = matrix.rows[x]
+        dash_x = scores_x[matrix.dash]
+        prev, row = row, [row[0] + dash_x] + [0] * len(seq_y)
+        for j in range(1, len(seq_y)+1):
+            y = y_codes[j-1]
+            row[j] = max(prev[j-1] + scores_x[y],
+                         row[j-1] + dash_row[y],
+                         prev[j] + dash_x)
+    if observed:
+        _report('global_last_row', len(seq_x) * len(seq_y),
+                {'fill': perf_counter() - start}, 2 * _list_bytes(row))
+    return row
+
+
+def compute_alignment_score(seq_x, seq_y, scoring_matrix, alignment='global'):
+    """
+    (str, str, dict, str) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return (score, i, j) where score is the score of an optimal 'global' or
+    'local' alignment of 'seq_x' and 'seq_y' and (i, j) is the entry of the
+    alignment matrix where that alignment ends. Only two rows of the matrix
+    are kept and, for local alignments, the best entry is tracked while
+    filling, so the result equals max_entry(compute_alignment_matrix(...))
+    without building the matrix.
+
+    'scoring_matrix' can also be a Profile of 'seq_x', see
+    compute_profile_score.
+    """
+    if isinstance(scoring_matrix, Profile):
+        return compute_profile_score(scoring_matrix, seq_y, alignment)
+
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    x_length, y_length = len(seq_x), len(seq_y)
+    if alignment == 'global':
+        row = global_last_row(seq_x, seq_y, scoring_matrix)
+        if observed:
+            _report('compute_alignment_score', x_length * y_length,
+                    {'fill': perf_counter() - start}, 2 * _list_bytes(row))
+        return (row[-1], x_length, y_length)
+
+    matrix = compile_scoring_matrix(scoring_matrix)
+    y_codes = matrix.encode(seq_y)
+    dash_row = matrix.rows[matrix.dash]
+    row = [0] * (y_length + 1)
+    for j in range(1, y_length+1):
+        row[j] = max(0, row[j-1] + dash_row[y_codes[j-1]])
+    best = max(row)
+    best_i, best_j = 0, row.index(best)
+
+    for i, x in enumerate(matrix.encode(seq_x), 1):
+        scores_x = matrix.rows[x]
+        dash_x = scores_x[matrix.dash]
+        prev, row = row, [max(0, row[0] + dash_x)] + [0] * y_length
+        for j in range(1, y_length+1):
+            y = y_codes[j-1]
+            row[j] = max(0, prev[j-1] + scores_x[y],
+                         row[j-1] + dash_row[y],
+                         prev[j] + dash_x)
+        row_best = max(row)
+        if row_best > best:
+            best, best_i, best_j = row_best, i, row.index(row_best)
+
+    if observed:
+        _report('compute_alignment_score', x_length * y_length,
+                {'fill': perf_counter() - start}, 2 * _list_bytes(row))
+    return (best, best_i, best_j)
+
+
+def compute_profile_score(profile, seq_y, alignment='global'):
+    """
+    (Profile, str, str) -> tuple
+
+    Return the same (score, i, j) as
+    compute_alignment_score(profile.query, seq_y, scoring_matrix, alignment).
+
+    The matrix is filled one column (one element of 'seq_y') at a time from
+    the rows of the query 'profile', so the query is only compiled once when
+    it is aligned against many sequences. Two columns are kept in memory.
+    """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    matrix = profile.scoring_matrix
+    gaps_x = profile.rows[matrix.dash]
+    local = alignment == 'local'
+    x_length, y_length = len(profile.query), len(seq_y)
+
+    col = [0] * (x_length + 1)
+    for i in range(1, x_length+1):
+        col[i] = col[i-1] + gaps_x[i-1]
+        if local:
+            col[i] = max(0, col[i])
+    best = max(col)
+    best_i, best_j = col.index(best), 0
+
+    for j, y in enumerate(matrix.encode(seq_y), 1):
+        scores_y, dash_y = profile.rows[y], profile.gaps[y]
+        up = col[0] + dash_y
+        if local:
+            up = max(0, up)
+        prev, col = col, [up]
+        if local:
+            for diag, left, score, dash_x in zip(prev, prev[1:], scores_y,
+                                                 gaps_x):
+                up = max(0, diag + score, left + dash_y, up + dash_x)
+                col.append(up)
+            col_best = max(col)
+            if col_best > best or (col_best == best and
+                                   col.index(col_best) < best_i):
+                best, best_i, best_j = col_best, col.index(col_best), j
+        else:
+            for diag, left, score, dash_x in zip(prev, prev[1:], scores_y,
+                                                 gaps_x):
+                up = max(diag + score, left + dash_y, up + dash_x)
+                col.append(up)
+
+    if observed:
+        _report('compute_profile_score', x_length * y_length,
+                {'fill': perf_counter() - start}, 2 * _list_bytes(col))
+    if not local:
+        return (col[-1], x_length, y_length)
+    return (best, best_i, best_j)
+
+
+def compute_global_alignment_linear(seq_x, seq_y, scoring_matrix):
+    """
+    (str, str, dict) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return a global alignment of 'seq_x' and 'seq_y' computed with
+    Hirschberg's divide and conquer algorithm. Output is a tuple of the form
+    (score, align_x, align_y), as for compute_global_alignment, but no
+    alignment matrix is built: the working memory is O(min(m, n)).
+
+    The score always agrees with compute_global_alignment. When several
+    optimal alignments exist the one returned may differ.
+    """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    with _Nested() as nested:
+        matrix = compile_scoring_matrix(scoring_matrix)
+        if len(seq_y) > len(seq_x):
+            score, align_y, align_x = _hirschberg(seq_y, seq_x,
+                                                  matrix.transpose())
+        else:
+            score, align_x, align_y = _hirschberg(seq_x, seq_y, matrix)
+    if observed:
+        phases = _merge_phases(nested.calls)
+        phases['split'] = perf_counter() - start - sum(phases.values())
+        _report('compute_global_alignment_linear',
+                sum(stats.cells for stats in nested.calls), phases,
+                max((stats.peak_bytes for stats in nested.calls), default=0))
+    return (score, align_x, align_y)
+
+
+def _hirschberg(seq_x, seq_y, scoring_matrix):
+    """
+    Recursive step of compute_global_alignment_linear. 'seq_y' is the
+    sequence the rows are laid along, so it should be the shorter one.
+    """
+    if len(seq_x) <= 1:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        return compute_global_alignment(seq_x, seq_y,
+                                        scoring_matrix, alignment_matrix)
+
+    mid = len(seq_x) // 2
+    forward = global_last_row(seq_x[:mid], seq_y, scoring_matrix)
+    reverse = global_last_row(seq_x[mid:][::-1], seq_y[::-1], scoring_matrix)
+
+    n = len(seq_y)
+    split = max(range(n+1), key=lambda j: forward[j] + reverse[n-j])
+
+    score1, left_x, left_y = _hirschberg(seq_x[:mid], seq_y[:split],
+                                         scoring_matrix)
+    score2, right_x, right_y = _hirschberg(seq_x[mid:], seq_y[split:],
+                                           scoring_matrix)
+    return (score1 + score2, left_x + right_x, left_y + right_y)
+
+
+def compute_banded_global_alignment(seq_x, seq_y, scoring_matrix, band=None):
+    """
+    (str, str, dict, int) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return a global alignment (score, align_x, align_y) of 'seq_x' and 'seq_y'
+    that only uses entries (i, j) of the alignment matrix lying at most 'band'
+    diagonals away from the diagonals between (0, 0) and (m, n). This costs
+    O(band * max(m, n)) instead of O(mn) and gives the same result as
+    compute_global_alignment whenever an optimal alignment stays in the band.
+
+    If 'band' is None, the band is widened until the banded score is at least
+    an upper bound on the score of any alignment leaving the band, so the
+    returned score is always optimal. The band is at least doubled, or
+    widened by as many diagonals as the bound exceeds the score by a pair of
+    dashes, each diagonal further costing a dash in each sequence.
+    """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    matrix = compile_scoring_matrix(scoring_matrix)
+    x_length, y_length = len(seq_x), len(seq_y)
+    if band is not None:
+        result = _banded_global_alignment(seq_x, seq_y, matrix, band)
+        if observed:
+            _report('compute_banded_global_alignment',
+                    _band_cells(x_length, y_length, *result[4:]),
+                    {'fill': perf_counter() - start}, _list_bytes(result[3]))
+        return result[:3]
+
+    cells, peak_bytes, phases = 0, 0, {'fill': 0.0, 'bound': 0.0}
+    dash_pair = max(1, -max((matrix.rows[x][matrix.dash]
+                             for x in matrix.encode(seq_x)), default=0) -
+                    max((matrix.rows[matrix.dash][y]
+                         for y in matrix.encode(seq_y)), default=0))
+    band = 4
+    while True:
+        score, align_x, align_y, rows, low, high = _banded_global_alignment(
+            seq_x, seq_y, matrix, band)
+        if observed:
+            filled = perf_counter()
+            phases['fill'] += filled - start
+            cells += _band_cells(x_length, y_length, low, high)
+            peak_bytes = max(peak_bytes, _list_bytes(rows))
+        if low <= -x_length and high >= y_length:
+            break
+        bound = _band_exit_bound(seq_x, seq_y, matrix, rows, low, high)
+        if observed:
+            start = perf_counter()
+            phases['bound'] += start - filled
+            cells += _band_cells(x_length, y_length, low, high)
+            peak_bytes = max(peak_bytes, 2 * _list_bytes(rows))
+        if score >= bound:
+            break
+        band += max(band, math.ceil((bound - score) / dash_pair))
+    if observed:
+        _report('compute_banded_global_alignment', cells, phases, peak_bytes)
+    return (score, align_x, align_y)
+
+
+def _band_cells(x_length, y_length, low, high):
+    """Return the number of entries (i, j) with low <= j - i <= high."""
+    return sum(min(y_length, i + high) - max(0, i + low) + 1
+               for i in range(x_length + 1)
+               if max(0, i + low) <= min(y_length, i + high))
+
+
+def _band_exit_bound(seq_x, seq_y, matrix, rows, low, high):
+    """
+    Return an upper bound on the score of any global alignment of 'seq_x' and
+    'seq_y' that visits an entry (i, j) with j - i outside [low, high], given
+    the banded alignment matrix 'rows' of _banded_global_alignment.
+
+    Such an alignment leaves the band a first time, with a gap to diagonal
+    high + 1 or low - 1, and comes back a last time, with a gap to diagonal
+    high or low. The banded matrix gives the exact best score up to the exit
+    and the banded matrix of the reversed sequences the exact best score
+    after the return. In between, the alignment scores at most the sum, over
+    the elements of one sequence, of their best score against an element of
+    the other sequence or a dash, plus one dash per element the other part
+    is longer by, minus the smallest loss of a dash against that best score
+    per element it is shorter by. Maximizing over the exits and returns
+    takes O(m + n) after the backward fill.
+    """
+    x_length, y_length = len(seq_x), len(seq_y)
+    x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+    x_set, y_set = set(x_codes), set(y_codes)
+    if not x_set or not y_set:
+        return float('-inf')
+    dash, dash_row = matrix.dash, matrix.rows[matrix.dash]
+    best_gap_x = max(matrix.rows[x][dash] for x in x_set)
+    best_gap_y = max(dash_row[y] for y in y_set)
+    best_x = {x: max(max(matrix.rows[x][y] for y in y_set),
+                     matrix.rows[x][dash] + max(0, best_gap_y))
+              for x in x_set}
+    best_y = {y: max(max(matrix.rows[x][y] for x in x_set),
+                     dash_row[y] + max(0, best_gap_x))
+              for y in y_set}
+    loss_x = max(matrix.rows[x][dash] - best_x[x] for x in x_set)
+    loss_y = max(dash_row[y] - best_y[y] for y in y_set)
+    suffix_x = [0] * (x_length + 1)
+    for i in range(x_length - 1, -1, -1):
+        suffix_x[i] = suffix_x[i+1] + best_x[x_codes[i]]
+    suffix_y = [0] * (y_length + 1)
+    for j in range(y_length - 1, -1, -1):
+        suffix_y[j] = suffix_y[j+1] + best_y[y_codes[j]]
+    backward = _banded_fill(x_codes[::-1], y_codes[::-1], matrix, low, high)
+
+    def after(i, j):
+        """Return the best banded score from (i, j) to (m, n)."""
+        return backward[x_length - i][(y_length - j) - (x_length - i) - low]
+
+    # (i, j, side, score) of the first entry outside the band (side 0 above
+    # it, 1 below it) with the best score up to it, and of the last entry
+    # outside the band with the best score from it
+    exits, returns = [], []
+    for i in range(x_length + 1):
+        j = i + high + 1
+        if j <= y_length:
+            exits.append((i, j, 0, rows[i][high - low] +
+                          dash_row[y_codes[j-1]]))
+            if i < x_length:
+                returns.append((i, j, 0, matrix.rows[x_codes[i]][dash] +
+                                after(i + 1, j)))
+        j = i + low - 1
+        if i > 0 and 0 <= j <= y_length:
+            exits.append((i, j, 1, rows[i-1][0] +
+                          matrix.rows[x_codes[i-1]][dash]))
+        if 0 <= j < y_length:
+            returns.append((i, j, 1, dash_row[y_codes[j]] + after(i, j + 1)))
+    diagonals = (high + 1, low - 1)
+
+    def between(suffix, axis, best_gap, loss, sign):
+        """
+        Maximize the exit score, plus the bound on the elements of one
+        sequence between an exit and a later return, plus the return score.
+        """
+        bound = float('-inf')
+        events = sorted([(point[axis], 0, point) for point in exits] +
+                        [(point[axis], 1, point) for point in returns])
+        best = [float('-inf'), float('-inf')]
+        for position, is_return, (i, j, side, score) in events:
+            if not is_return:
+                best[side] = max(best[side], score + suffix[position])
+                continue
+            for exit_side in (0, 1):
+                excess = sign * (diagonals[side] - diagonals[exit_side])
+                bound = max(bound, best[exit_side] - suffix[position] +
+                            max(0, excess) * best_gap -
+                            min(0, excess) * loss + score)
+        return bound
+
+    return min(between(suffix_x, 0, best_gap_y, loss_x, 1),
+               between(suffix_y, 1, best_gap_x, loss_y, -1))
+
+
+def _banded_fill(x_codes, y_codes, matrix, low, high):
+    """
+    Return the banded global alignment matrix of the encoded sequences
+    'x_codes' and 'y_codes', entry (i, j) in rows[i][j - i - low] for the
+    diagonals j - i in [low, high] and -inf elsewhere (every row has one
+    more -inf entry at the end, so the entry above the last diagonal needs
+    no test).
+    """
+    x_length, y_length = len(x_codes), len(y_codes)
+    width = high - low + 1
+    dash_row = matrix.rows[matrix.dash]
+    minus_inf = float('-inf')
+
+    row = [minus_inf] * (width + 1)
+    row[-low] = score = 0
+    for j in range(1, min(y_length, high) + 1):
+        score += dash_row[y_codes[j-1]]
+        row[j - low] = score
+    rows = [row]
+    for i in range(1, x_length + 1):
+        prev = row
+        row = [minus_inf] * (width + 1)
+        scores_x = matrix.rows[x_codes[i-1]]
+        dash_x = scores_x[matrix.dash]
+        offset = -i - low
+        start = max(0, i + low)
+        left = minus_inf
+        if start == 0:
+            row[offset] = left = prev[offset + 1] + dash_x
+            start = 1
+        for j in range(start, min(y_length, i + high) + 1):
+            k = j + offset
+            y = y_codes[j-1]
+            best = prev[k] + scores_x[y]
+            score = prev[k+1] + dash_x
+            if score > best:
+                best = score
+            score = left + dash_row[y]
+            if score > best:
+                best = score
+            row[k] = left = best
+        rows.append(row)
+    return rows
+
+
+def _banded_global_alignment(seq_x, seq_y, matrix, band):
+    """
+    Fill and backtrack the banded global alignment matrix. Entry (i, j) is
+    stored in rows[i][j - i - low] for the diagonals j - i in [low, high].
+
+    Return (score, align_x, align_y, rows, low, high).
+    """
+    x_length, y_length = len(seq_x), len(seq_y)
+    low = min(0, y_length - x_length) - band
+    high = max(0, y_length - x_length) + band
+    x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+    dash_row = matrix.rows[matrix.dash]
+    rows = _banded_fill(x_codes, y_codes, matrix, low, high)
+
+    align_x, align_y = [], []
+    i, j = x_length, y_length
+    while i > 0 or j > 0:
+        k = j - i - low
+        current = rows[i][k]
+        if i > 0 and j > 0 and current == rows[i-1][k] + \
+                matrix.rows[x_codes[i-1]][y_codes[j-1]]:
+            align_x.append(seq_x[i-1])
+            align_y.append(seq_y[j-1])
+            i -= 1
+            j -= 1
+        elif j > 0 and k > 0 and current == rows[i][k-1] + \
+                dash_row[y_codes[j-1]]:
+            align_x.append('-')
+            align_y.append(seq_y[j-1])
+            j -= 1
+        else:
+            align_x.append(seq_x[i-1])
+            align_y.append('-')
+            i -= 1
+
+    return (rows[x_length][y_length - x_length - low],
+            ''.join(reversed(align_x)), ''.join(reversed(align_y)), rows, low,
+            high)
+
+
 def max_entry(matrix):
         """
         list -> tuple
@@ -151,29 +846,279 @@ def compute_local_alignment(seq_x, seq_y, scoring_matrix, alignment_matrix):
     (score, align_x, align_y) where score is the score of the optimal local
     alignment 'align_x' and 'align_y'.
     """
-    align_x, align_y = '', ''
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    align_x, align_y = [], []
     m, i, j = max_entry(alignment_matrix)
+    if observed:
+        found = perf_counter()
 
     while alignment_matrix[i][j] > 0:
         if alignment_matrix[i][j] == alignment_matrix[i-1][j-1] + \
                                     scoring_matrix[seq_x[i-1]][seq_y[j-1]]:
-            align_x = seq_x[i-1] + align_x
-            align_y = seq_y[j-1] + align_y
+            align_x.append(seq_x[i-1])
+            align_y.append(seq_y[j-1])
             i -= 1
             j -= 1
         elif alignment_matrix[i][j] == alignment_matrix[i][j-1] + \
                                       scoring_matrix['-'][seq_y[j-1]]:
-            align_x = '-' + align_x
-            align_y = seq_y[j-1] + align_y
+            align_x.append('-')
+            align_y.append(seq_y[j-1])
             j -= 1
         else:
-            align_x = seq_x[i-1] + align_x
-            align_y = '-' + align_y
+            align_x.append(seq_x[i-1])
+            align_y.append('-')
             i -= 1
 
+    align_x, align_y = ''.join(reversed(align_x)), ''.join(reversed(align_y))
+    if observed:
+        _report('compute_local_alignment',
+                len(alignment_matrix) * len(alignment_matrix[0]) +
+                len(align_x),
+                {'max_entry': found - start,
+                 'traceback': perf_counter() - found}, 0)
     return (m, align_x, align_y)
 
 
+def compute_local_alignments(seq_x, seq_y, scoring_matrix, k):
+    """
+    (str, str, dict, int) -> list
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return up to 'k' local alignments of 'seq_x' and 'seq_y' as a list of
+    tuples (score, align_x, align_y), best first, such that no two of them
+    pair the same elements x_i and y_j (Waterman and Eggert, 1987). The first
+    one is the alignment of compute_local_alignment. Alignments with a score
+    of 0 are not reported.
+
+    The local alignment matrix is computed once. After an alignment is
+    reported, the entries where it pairs two elements are set to 0 and only
+    the entries that depend on them are recomputed, row by row, until a row
+    is left unchanged.
+    """
+    observed = bool(_OBSERVERS)
+    with _Nested() as nested:
+        matrix = compile_scoring_matrix(scoring_matrix)
+        x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y, matrix,
+                                                    'local')
+    if observed:
+        start = perf_counter()
+        phases = _merge_phases(nested.calls, {'traceback': 0.0,
+                                              'update': 0.0})
+        cells = sum(stats.cells for stats in nested.calls)
+    row_max = [max(row) for row in alignment_matrix]
+    forbidden = set()
+    alignments = []
+
+    while len(alignments) < k:
+        score = max(row_max)
+        if score <= 0:
+            break
+        i = row_max.index(score)
+        j = alignment_matrix[i].index(score)
+
+        align_x, align_y, pairs = [], [], []
+        while alignment_matrix[i][j] > 0:
+            value = alignment_matrix[i][j]
+            if value == alignment_matrix[i-1][j-1] + \
+                    matrix.rows[x_codes[i-1]][y_codes[j-1]]:
+                pairs.append((i, j))
+                align_x.append(seq_x[i-1])
+                align_y.append(seq_y[j-1])
+                i -= 1
+                j -= 1
+            elif value == alignment_matrix[i][j-1] + \
+                    matrix.rows[matrix.dash][y_codes[j-1]]:
+                align_x.append('-')
+                align_y.append(seq_y[j-1])
+                j -= 1
+            else:
+                align_x.append(seq_x[i-1])
+                align_y.append('-')
+                i -= 1
+        alignments.append((score, ''.join(reversed(align_x)),
+                           ''.join(reversed(align_y))))
+        if observed:
+            found = perf_counter()
+            phases['traceback'] += found - start
+            cells += len(align_x)
+
+        forbidden.update(pairs)
+        recomputed = _update_local_matrix(alignment_matrix, row_max, x_codes,
+                                          y_codes, matrix, forbidden, pairs)
+        if observed:
+            start = perf_counter()
+            phases['update'] += start - found
+            cells += recomputed
+
+    if observed:
+        phases['traceback'] += perf_counter() - start
+        _report('compute_local_alignments', cells, phases,
+                _list_bytes(alignment_matrix, row_max))
+    return alignments
+
+
+def _update_local_matrix(alignment_matrix, row_max, x_codes, y_codes, matrix,
+                         forbidden, pairs):
+    """
+    Set the entries 'pairs' of the local 'alignment_matrix' to 0 and
+    recompute the entries depending on them, keeping 'row_max' up to date.
+    Entries in 'forbidden' stay 0. Return the number of entries recomputed.
+    """
+    dash_row = matrix.rows[matrix.dash]
+    y_length = len(y_codes)
+    starts = {}
+    for i, j in pairs:
+        starts.setdefault(i, []).append(j)
+
+    recomputed = 0
+    changed = set()
+    i, last_start = min(starts), max(starts)
+    while i < len(alignment_matrix) and (changed or i <= last_start):
+        prev, row = alignment_matrix[i-1], alignment_matrix[i]
+        scores_x = matrix.rows[x_codes[i-1]]
+        dash_x = scores_x[matrix.dash]
+        candidates = set(starts.get(i, ()))
+        for j in changed:
+            candidates.update((j, j + 1))
+        row_changed = set()
+        j = min(candidates, default=y_length + 1)
+        last = max(candidates, default=y_length)
+        while j <= y_length:
+            if j > last and j - 1 not in row_changed:
+                break
+            if j > 0 and (j in candidates or j - 1 in row_changed):
+                recomputed += 1
+                if (i, j) in forbidden:
+                    value = 0
+                else:
+                    y = y_codes[j-1]
+                    value = max(0, prev[j-1] + scores_x[y],
+                                row[j-1] + dash_row[y], prev[j] + dash_x)
+                if value != row[j]:
+                    row[j] = value
+                    row_changed.add(j)
+            j += 1
+        if row_changed:
+            row_max[i] = max(row)
+        changed = row_changed
+        i += 1
+    return recomputed
+
+
+# 2-bit traceback codes of compute_alignment_traceback
+STOP, DIAG, LEFT, UP = 0, 1, 2, 3
+
+
+def compute_alignment_traceback(seq_x, seq_y, scoring_matrix,
+                                alignment='global'):
+    """
+    (str, str, dict, str) -> tuple
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return the same (score, align_x, align_y) as compute_global_alignment or
+    compute_local_alignment applied to compute_alignment_matrix(seq_x, seq_y,
+    scoring_matrix, alignment), without keeping the alignment matrix.
+
+    While two rows of scores are filled, the move chosen for every entry is
+    recorded as a 2-bit code (DIAG, LEFT, UP, or STOP where a local alignment
+    starts), packed four to a byte. The backtrack only follows these codes,
+    collecting the aligned elements in lists that are reversed once.
+    """
+    observed = bool(_OBSERVERS)
+    if observed:
+        start = perf_counter()
+    matrix = compile_scoring_matrix(scoring_matrix)
+    x_codes, y_codes = matrix.encode(seq_x), matrix.encode(seq_y)
+    x_length, y_length = len(seq_x), len(seq_y)
+    dash_row = matrix.rows[matrix.dash]
+    local = alignment == 'local'
+    row_bytes = (y_length + 4) // 4
+    padding = [STOP] * (row_bytes * 4 - y_length - 1)
+    traceback = bytearray()
+
+    def pack(codes):
+        codes += padding
+        traceback.extend(a | b << 2 | c << 4 | d << 6 for a, b, c, d in
+                         zip(codes[0::4], codes[1::4], codes[2::4],
+                             codes[3::4]))
+
+    row, codes = [0] * (y_length + 1), [STOP] * (y_length + 1)
+    for j in range(1, y_length+1):
+        row[j] = row[j-1] + dash_row[y_codes[j-1]]
+        if local:
+            row[j] = max(0, row[j])
+        codes[j] = LEFT if row[j] or not local else STOP
+    pack(codes)
+    best = max(row)
+    best_i, best_j = 0, row.index(best)
+
+    for i in range(1, x_length+1):
+        scores_x = matrix.rows[x_codes[i-1]]
+        dash_x = scores_x[matrix.dash]
+        prev, row = row, [row[0] + dash_x]
+        if local:
+            row[0] = max(0, row[0])
+        codes = [UP if row[0] or not local else STOP]
+        for j in range(1, y_length+1):
+            y = y_codes[j-1]
+            s1 = prev[j-1] + scores_x[y]
+            s2 = row[j-1] + dash_row[y]
+            s3 = prev[j] + dash_x
+            value = max(s1, s2, s3)
+            if local and value <= 0:
+                row.append(0)
+                codes.append(STOP)
+                continue
+            row.append(value)
+            codes.append(DIAG if value == s1 else LEFT if value == s2 else UP)
+        pack(codes)
+        if local:
+            row_best = max(row)
+            if row_best > best:
+                best, best_i, best_j = row_best, i, row.index(row_best)
+
+    if observed:
+        filled = perf_counter()
+    if local:
+        score, i, j = best, best_i, best_j
+    else:
+        score, i, j = row[-1], x_length, y_length
+
+    align_x, align_y = [], []
+    while i > 0 or j > 0:
+        code = traceback[i * row_bytes + (j >> 2)] >> ((j & 3) << 1) & 3
+        if code == DIAG:
+            i -= 1
+            j -= 1
+            align_x.append(seq_x[i])
+            align_y.append(seq_y[j])
+        elif code == LEFT:
+            j -= 1
+            align_x.append('-')
+            align_y.append(seq_y[j])
+        elif code == UP:
+            i -= 1
+            align_x.append(seq_x[i])
+            align_y.append('-')
+        else:
+            break
+
+    if observed:
+        _report('compute_alignment_traceback', x_length * y_length,
+                {'fill': filled - start,
+                 'traceback': perf_counter() - filled},
+                sys.getsizeof(traceback) + 2 * _list_bytes(row) +
+                _list_bytes(codes))
+    return (score, ''.join(reversed(align_x)), ''.join(reversed(align_y)))
+
+
 def string_compare(x, y):
     """
     (str, str) -> float
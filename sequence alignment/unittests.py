@@ -1,4 +1,13 @@
 from tools import *
+from math import exp
+from random import Random
+from load_and_print import *
+
+
+def alignment_score(align_x, align_y, scoring_matrix):
+    """Return the score of an alignment by summing its columns."""
+    return sum(scoring_matrix[x][y] for x, y in zip(align_x, align_y))
+
 
 def unit_test1():
     diag_score = 10
@@ -70,7 +79,752 @@ def unit_test2():
     return 'unit test 2 passes'
 
 
+def unit_test3():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    for seq_x, seq_y in [(human_protein, fly_protein),
+                         (fly_protein, human_protein),
+                         (human_protein[:60], fly_protein[100:130]),
+                         ('', fly_protein[:10]),
+                         (human_protein[:10], '')]:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        expected = compute_global_alignment(seq_x, seq_y, scoring_matrix,
+                                            alignment_matrix)
+        score, align_x, align_y = compute_global_alignment_linear(
+            seq_x, seq_y, scoring_matrix)
+
+        assert(score == expected[0])
+        assert(len(align_x) == len(align_y))
+        assert(align_x.replace('-', '') == seq_x)
+        assert(align_y.replace('-', '') == seq_y)
+        assert(alignment_score(align_x, align_y, scoring_matrix) == score)
+
+    return 'unit test 3 passes'
+
+
+def unit_test4():
+    from vectorized import compute_alignment_matrix_vectorized
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    for seq_x, seq_y in [(human_protein, fly_protein),
+                         (human_protein[:5], ''),
+                         ('', fly_protein[:5]),
+                         ('', '')]:
+        for alignment_type in ['global', 'local']:
+            expected = compute_alignment_matrix(seq_x, seq_y, scoring_matrix,
+                                                alignment_type)
+            alignment_matrix = compute_alignment_matrix_vectorized(
+                seq_x, seq_y, scoring_matrix, alignment_type)
+            assert(alignment_matrix.tolist() == expected)
+            assert(compute_alignment_matrix_vectorized(
+                seq_x, seq_y, scoring_matrix, alignment_type,
+                as_list=True) == expected)
+
+    alignment_matrix = compute_alignment_matrix_vectorized(
+        human_protein, fly_protein, scoring_matrix, 'global')
+    assert(compute_global_alignment(human_protein, fly_protein,
+                                    scoring_matrix, alignment_matrix) ==
+           compute_global_alignment(human_protein, fly_protein,
+                                    scoring_matrix,
+                                    alignment_matrix.tolist()))
+    alignment_matrix = compute_alignment_matrix_vectorized(
+        human_protein, fly_protein, scoring_matrix, 'local')
+    assert(compute_local_alignment(human_protein, fly_protein,
+                                   scoring_matrix, alignment_matrix) ==
+           compute_local_alignment(human_protein, fly_protein,
+                                   scoring_matrix,
+                                   alignment_matrix.tolist()))
+
+    return 'unit test 4 passes'
+
+
+def unit_test5():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    for seq_x, seq_y in [(human_protein, fly_protein),
+                         (fly_protein[:40], human_protein[:70]),
+                         ('', fly_protein[:5]),
+                         (human_protein[:5], '')]:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'local')
+        assert(compute_alignment_score(seq_x, seq_y, scoring_matrix, 'local')
+               == max_entry(alignment_matrix))
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        assert(compute_alignment_score(seq_x, seq_y, scoring_matrix, 'global')
+               == (alignment_matrix[-1][-1], len(seq_x), len(seq_y)))
+
+    scoring_matrix = build_scoring_matrix(set('ACTG'), 10, 4, -6)
+    assert(compute_alignment_score('AA', 'TAAT', scoring_matrix, 'local') ==
+           (20, 2, 3))
+
+    return 'unit test 5 passes'
+
+
+def unit_test6():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')[:40]
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')[:60]
+
+    distributions = [generate_null_distribution_parallel(
+                         human_protein, fly_protein, scoring_matrix, 45,
+                         seed=7, processes=processes, chunk_size=10)
+                     for processes in [1, 2, 3]]
+    assert(distributions[0] == distributions[1] == distributions[2])
+    assert(list(distributions[0].items()) == list(distributions[2].items()))
+    assert(sum(distributions[0].values()) == 45)
+
+    expected = {}
+    for k, num_trials in enumerate([10, 10, 10, 10, 5]):
+        partial = generate_null_distribution(human_protein, fly_protein,
+                                             scoring_matrix, num_trials,
+                                             Random('7:{}'.format(k)))
+        for score, count in partial.items():
+            expected[score] = expected.get(score, 0) + count
+    assert(distributions[0] == expected)
+
+    return 'unit test 6 passes'
+
+
+def unit_test7():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    compiled = ScoringMatrix(scoring_matrix)
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    assert(compile_scoring_matrix(compiled) is compiled)
+    for x in scoring_matrix:
+        for y in scoring_matrix:
+            assert(compiled[x][y] == scoring_matrix[x][y] ==
+                   compiled.scores[compiled.codes[x] * compiled.size +
+                                   compiled.codes[y]])
+
+    seq_x, seq_y = human_protein[:150], fly_protein[:200]
+    for alignment_type in ['global', 'local']:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix,
+                                                    alignment_type)
+        assert(compute_alignment_matrix(seq_x, seq_y, compiled,
+                                        alignment_type) == alignment_matrix)
+        assert(compute_alignment_score(seq_x, seq_y, compiled,
+                                       alignment_type) ==
+               compute_alignment_score(seq_x, seq_y, scoring_matrix,
+                                       alignment_type))
+    assert(compute_local_alignment(seq_x, seq_y, compiled, alignment_matrix)
+           == compute_local_alignment(seq_x, seq_y, scoring_matrix,
+                                      alignment_matrix))
+    assert(compute_global_alignment_linear(seq_x, seq_y, compiled)[0] ==
+           compute_global_alignment_linear(seq_x, seq_y, scoring_matrix)[0])
+
+    profile = compiled.profile(human_protein)
+    for seq_y in [fly_protein, fly_protein[::-1], fly_protein[:3], '']:
+        for alignment_type in ['global', 'local']:
+            assert(compute_profile_score(profile, seq_y, alignment_type) ==
+                   compute_alignment_score(human_protein, seq_y,
+                                           scoring_matrix, alignment_type))
+            assert(compute_alignment_score(human_protein, seq_y, profile,
+                                           alignment_type) ==
+                   compute_profile_score(profile, seq_y, alignment_type))
+
+    seq_x = 'happypedestrianwalker'
+    seq_y = 'sadpedesxtriandriver'
+    scoring_matrix = build_scoring_matrix(set(seq_x) | set(seq_y), 2, -1, -1)
+    profile = ScoringMatrix(scoring_matrix).profile(seq_x)
+    for seq_y in [seq_y, 'pedestrian', 'xxpedxxestrxxian', 'aaa']:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'local')
+        assert(compute_profile_score(profile, seq_y, 'local') ==
+               max_entry(alignment_matrix))
+
+    return 'unit test 7 passes'
+
+
+def unit_test8():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    consensus = read_protein('alg_ConsensusPAXDomain.txt')
+
+    alignment_matrix = compute_alignment_matrix(human_protein, fly_protein,
+                                                scoring_matrix, 'local')
+    score, seq_human, seq_fly = compute_local_alignment(
+        human_protein, fly_protein, scoring_matrix, alignment_matrix)
+
+    for seq_x, seq_y in [(seq_human.replace('-', ''), consensus),
+                         (seq_fly.replace('-', ''), consensus),
+                         (human_protein[:200], fly_protein[:150]),
+                         ('', consensus[:5]),
+                         (consensus[:5], '')]:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        expected = compute_global_alignment(seq_x, seq_y, scoring_matrix,
+                                            alignment_matrix)
+        result = compute_banded_global_alignment(seq_x, seq_y, scoring_matrix)
+        assert(result[0] == expected[0])
+        assert(alignment_score(result[1], result[2], scoring_matrix) ==
+               result[0])
+
+    seq_x = seq_human.replace('-', '')
+    alignment_matrix = compute_alignment_matrix(seq_x, consensus,
+                                                scoring_matrix, 'global')
+    assert(compute_banded_global_alignment(seq_x, consensus, scoring_matrix,
+                                           band=10) ==
+           compute_global_alignment(seq_x, consensus, scoring_matrix,
+                                    alignment_matrix))
+
+    # identical sequences are proved optimal by the first band
+    from tools import _band_exit_bound, _banded_global_alignment
+    matrix = compile_scoring_matrix(scoring_matrix)
+    seq_x = human_protein[:200]
+    score, _, _, rows, low, high = _banded_global_alignment(seq_x, seq_x,
+                                                            matrix, 4)
+    assert(score >= _band_exit_bound(seq_x, seq_x, matrix, rows, low, high))
+
+    rng = Random(8)
+    for _ in range(200):
+        seq_x = ''.join(rng.choice('ACDEFGHIKLMNPQRSTVWY')
+                        for _ in range(rng.randint(0, 40)))
+        seq_y = list(seq_x)
+        for _ in range(rng.randint(0, 12)):
+            k = rng.randint(0, len(seq_y))
+            if rng.random() < 0.5:
+                seq_y.insert(k, rng.choice('ACDEFG'))
+            elif k < len(seq_y):
+                del seq_y[k]
+        seq_y = ''.join(seq_y)
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        assert(compute_banded_global_alignment(seq_x, seq_y,
+                                               scoring_matrix)[0] ==
+               compute_global_alignment(seq_x, seq_y, scoring_matrix,
+                                        alignment_matrix)[0])
+
+    return 'unit test 8 passes'
+
+
+def unit_test9():
+    from affine import compute_affine_alignment, compute_affine_alignment_score
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    seq_x, seq_y = human_protein[:120], fly_protein[:160]
+
+    # with gap_open == gap_extend == the '-' score of PAM50 the scores are
+    # the linear gap ones
+    for alignment_type in ['global', 'local']:
+        expected = compute_alignment_score(seq_x, seq_y, scoring_matrix,
+                                           alignment_type)
+        assert(compute_affine_alignment_score(seq_x, seq_y, scoring_matrix,
+                                              -5, -5, alignment_type) ==
+               expected)
+        result = compute_affine_alignment(seq_x, seq_y, scoring_matrix,
+                                          -5, -5, alignment_type)
+        assert(result[0] == expected[0])
+        assert(alignment_score(result[1], result[2], scoring_matrix) ==
+               result[0])
+
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 5, -4, 0)
+    assert(compute_affine_alignment('ACGTTTTACG', 'ACGACG', scoring_matrix,
+                                    -10, -1) ==
+           (17, 'ACGTTTTACG', 'ACG----ACG'))
+    assert(compute_affine_alignment('TTACGTTTTACGTT', 'GGACGACGGG',
+                                    scoring_matrix, -10, -1, 'local') ==
+           (17, 'ACGTTTTACG', 'ACG----ACG'))
+    assert(compute_affine_alignment('', 'ACG', scoring_matrix, -10, -1) ==
+           (-12, '---', 'ACG'))
+    assert(compute_affine_alignment('ACG', '', scoring_matrix, -10, -1) ==
+           (-12, 'ACG', '---'))
+    assert(compute_affine_alignment('AAA', 'CCC', scoring_matrix, -10, -1,
+                                    'local') == (0, '', ''))
+
+    return 'unit test 9 passes'
+
+
+def unit_test10():
+    import os
+    import tempfile
+    from search import read_fasta, search_database
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    rng = Random(10)
+
+    records = []
+    for k in range(30):
+        rand_list = list(fly_protein[:120])
+        rng.shuffle(rand_list)
+        records.append(('random{}'.format(k), ''.join(rand_list)))
+    records.insert(17, ('fly', fly_protein))
+    records.insert(5, ('human', human_protein[:150]))
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'db.fasta')
+        with open(filename, 'w') as fasta_file:
+            for name, seq in records:
+                fasta_file.write('>{} description\n'.format(name))
+                for start in range(0, len(seq), 60):
+                    fasta_file.write(seq[start:start+60] + '\n')
+        assert(list(read_fasta(filename)) == records)
+
+        query = human_protein[:200]
+        hits = search_database(query, filename, scoring_matrix, k=4,
+                               processes=1, chunk_size=7)
+        assert(hits == search_database(query, filename, scoring_matrix, k=4,
+                                       processes=2, chunk_size=5))
+        assert(search_database(query, filename, scoring_matrix, k=0,
+                               processes=1) == [])
+
+    scores = sorted(((compute_alignment_score(query, seq, scoring_matrix,
+                                              'local')[0], name)
+                     for name, seq in records), key=lambda hit: -hit[0])
+    assert([(score, name) for score, name, _, _ in hits] == scores[:4])
+    assert([name for _, name, _, _ in hits[:2]] == ['human', 'fly'])
+    assert(hits[1][2:] == compute_local_alignment(
+        query, fly_protein, scoring_matrix,
+        compute_alignment_matrix(query, fly_protein, scoring_matrix,
+                                 'local'))[1:])
+
+    return 'unit test 10 passes'
+
+
+def unit_test11():
+    import os
+    import tempfile
+    from search import read_fasta
+    from sequence_store import SequenceStore
+
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'db.fasta')
+        with open(filename, 'w') as fasta_file:
+            fasta_file.write('>human eyeless\n')
+            for start in range(0, len(human_protein), 60):
+                fasta_file.write(human_protein[start:start+60] + '\n')
+            fasta_file.write('>empty\n>fly\n' + fly_protein + '\n')
+            fasta_file.write('>ragged\nACD\nEFGHI\n\nKL\n')
+
+        with SequenceStore(filename) as store:
+            assert(os.path.exists(filename + '.fai'))
+            assert(store.names() == ['human', 'empty', 'fly', 'ragged'])
+            assert([(name, store[name]) for name in store.names()] ==
+                   list(read_fasta(filename)))
+            assert(store[0] == human_protein and store['fly'] == fly_protein)
+            assert(isinstance(store.get_bytes('fly'), memoryview))
+            assert(bytes(store.get_bytes('fly')) == fly_protein.encode())
+            assert(store.length('ragged') == 10)
+            for key in ['human', 'ragged']:
+                for start, end in [(0, 5), (55, 125), (59, 61), (3, 3)]:
+                    assert(store.fetch(key, start, end) ==
+                           store[key][start:end])
+        with open(filename + '.fai') as index_file:
+            assert(index_file.readline() ==
+                   'human\t{}\t15\t60\t61\n'.format(len(human_protein)))
+        with SequenceStore(filename) as store:
+            assert(store['ragged'] == 'ACDEFGHIKL')
+
+        with SequenceStore('alg_HumanEyelessProtein.txt',
+                           os.path.join(directory, 'human.fai')) as store:
+            assert(len(store) == 1 and store[0] == human_protein)
+
+    return 'unit test 11 passes'
+
+
+def unit_test12():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    consensus = read_protein('alg_ConsensusPAXDomain.txt')
+
+    cases = [(human_protein, fly_protein, scoring_matrix),
+             (consensus, human_protein[:200], scoring_matrix),
+             (human_protein[:3], '', scoring_matrix),
+             ('', fly_protein[:3], scoring_matrix),
+             ('AA', 'TAAT', build_scoring_matrix(set('ACTG'), 10, 4, -6))]
+    seq_x, seq_y = 'happypedestrianwalker', 'sadpedesxtriandriver'
+    cases.append((seq_x, seq_y,
+                  build_scoring_matrix(set(seq_x) | set(seq_y), 2, -1, -1)))
+
+    for seq_x, seq_y, scoring_matrix in cases:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'global')
+        assert(compute_alignment_traceback(seq_x, seq_y, scoring_matrix,
+                                           'global') ==
+               compute_global_alignment(seq_x, seq_y, scoring_matrix,
+                                        alignment_matrix))
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'local')
+        assert(compute_alignment_traceback(seq_x, seq_y, scoring_matrix,
+                                           'local') ==
+               compute_local_alignment(seq_x, seq_y, scoring_matrix,
+                                       alignment_matrix))
+
+    return 'unit test 12 passes'
+
+
+def aligned_pairs(seq_x, seq_y, align_x, align_y):
+    """
+    Return the set of index pairs (i, j) of the elements of 'seq_x' and
+    'seq_y' paired by a local alignment, located by its first occurrence.
+    """
+    i = seq_x.index(align_x.replace('-', ''))
+    j = seq_y.index(align_y.replace('-', ''))
+    pairs = set()
+    for x, y in zip(align_x, align_y):
+        if x != '-' and y != '-':
+            pairs.add((i, j))
+        i += x != '-'
+        j += y != '-'
+    return pairs
+
+
+def unit_test13():
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    alignments = compute_local_alignments(human_protein, fly_protein,
+                                          scoring_matrix, 5)
+    assert([score for score, _, _ in alignments] == [875, 562, 88, 56, 55])
+    assert(alignments[0] == compute_alignment_traceback(
+        human_protein, fly_protein, scoring_matrix, 'local'))
+    for score, align_x, align_y in alignments:
+        assert(alignment_score(align_x, align_y, scoring_matrix) == score)
+    pairs = [aligned_pairs(human_protein, fly_protein, align_x, align_y)
+             for _, align_x, align_y in alignments[:2]]
+    assert(not pairs[0] & pairs[1])
+
+    seq_x, seq_y = 'ACGTACGTTTACGTACGT', 'ACGTACGTACGT'
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 2, -1, -2)
+    assert(compute_local_alignments(seq_x, seq_y, scoring_matrix, 4) ==
+           [(20, 'ACGTACGTTTACGT', 'ACGTACG--TACGT'),
+            (20, 'ACGTTTACGTACGT', 'ACG--TACGTACGT'),
+            (16, 'ACGTACGT', 'ACGTACGT'),
+            (16, 'ACGTACGT', 'ACGTACGT')])
+    assert(compute_local_alignments('AAA', 'CCC', scoring_matrix, 3) == [])
+
+    return 'unit test 13 passes'
+
+
+def unit_test14():
+    from significance import alignment_significance, gumbel_fit, gumbel_sf
+
+    location, scale = gumbel_fit(10, 2)
+    assert(abs(gumbel_sf(location, location, scale) - (1 - exp(-1))) < 1e-12)
+    assert(0 < gumbel_sf(1000, location, scale) < 1e-100)
+    assert(gumbel_sf(-1e9, location, scale) == 1.0)
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+
+    result = alignment_significance(human_protein, fly_protein,
+                                    scoring_matrix)
+    assert(result.significant and result.score == 875)
+    assert(result.num_trials <= 50)
+    assert(result.p_value < 1e-20 and result.z_score > 20)
+
+    rand_list = list(fly_protein[:200])
+    Random(1).shuffle(rand_list)
+    result = alignment_significance(human_protein[:150], ''.join(rand_list),
+                                    scoring_matrix)
+    assert(not result.significant and result.num_trials <= 50)
+
+    return 'unit test 14 passes'
+
+
+def unit_test15():
+    from seeds import KmerIndex, extend_ungapped, seed_and_extend
+
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 2, -3, -4)
+    assert(extend_ungapped('TTACGTAGGG', 'CCACGTACCC', 3, 3, 3,
+                           scoring_matrix, 5) == (10, 2, 2, 5))
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    rng = Random(3)
+    targets = {'fly': fly_protein}
+    for k in range(20):
+        rand_list = list(fly_protein)
+        rng.shuffle(rand_list)
+        targets['random{}'.format(k)] = ''.join(rand_list)
+
+    index = KmerIndex(targets, k=3)
+    assert(('fly', 0) in index.kmers[fly_protein[:3]])
+    result = seed_and_extend(human_protein, index, scoring_matrix)
+    assert(result.hits[0][:2] == (875, 'fly'))
+    assert(result.hits[0][2:] == compute_alignment_traceback(
+        human_protein, fly_protein, scoring_matrix, 'local')[1:])
+    assert(all(name == 'fly' for _, name, _, _ in result.hits))
+    assert(result.full_scan_cells ==
+           len(human_protein) * 21 * len(fly_protein))
+    assert(result.cells_computed * 20 < result.full_scan_cells)
+
+    return 'unit test 15 passes'
+
+
+def unit_test16():
+    import tempfile
+    from cache import AlignmentCache, alignment_key
+
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 10, 4, -6)
+    same_matrix = compile_scoring_matrix(
+        {row: dict(cols) for row, cols in scoring_matrix.items()})
+    expected = compute_alignment_traceback('ACGTAC', 'AGTACC',
+                                           scoring_matrix, 'local')
+
+    assert(alignment_key(compute_alignment_traceback, 'ACG', 'AC',
+                         scoring_matrix, 'local') ==
+           alignment_key(compute_alignment_traceback, 'ACG', 'AC',
+                         same_matrix, 'local'))
+    assert(alignment_key(compute_alignment_traceback, 'ACG', 'AC',
+                         scoring_matrix, 'local') !=
+           alignment_key(compute_alignment_traceback, 'ACG', 'AC',
+                         scoring_matrix, 'global'))
+
+    cache = AlignmentCache(maxsize=2)
+    assert(cache.align('ACGTAC', 'AGTACC', scoring_matrix, 'local') ==
+           expected)
+    assert(cache.align('ACGTAC', 'AGTACC', same_matrix, 'local') == expected)
+    assert(cache.info() == (1, 0, 1, 1, 2))
+    cache.score('ACGTAC', 'AGTACC', scoring_matrix, 'local')
+    cache.align('AC', 'AC', scoring_matrix)
+    assert(len(cache) == 2)
+    cache.align('ACGTAC', 'AGTACC', scoring_matrix, 'local')
+    assert(cache.info() == (1, 0, 4, 2, 2))
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = AlignmentCache(directory=directory)
+        cache.align('ACGTAC', 'AGTACC', scoring_matrix, 'local')
+        cache = AlignmentCache(directory=directory)
+        assert(cache.align('ACGTAC', 'AGTACC', scoring_matrix, 'local') ==
+               expected)
+        assert(cache.info() == (0, 1, 0, 1, 128))
+
+    return 'unit test 16 passes'
+
+
+def unit_test17():
+    import os
+    import tempfile
+    from batch import all_vs_all_scores, is_symmetric
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    rng = Random(1)
+    sequences = [''.join(rng.choice(fly_protein)
+                         for _ in range(rng.randint(0, 40)))
+                 for _ in range(8)]
+
+    for alignment in ['global', 'local']:
+        expected = [[compute_alignment_score(seq_x, seq_y, scoring_matrix,
+                                             alignment)[0]
+                     for seq_y in sequences] for seq_x in sequences]
+        for processes in [1, 2]:
+            scores = all_vs_all_scores(sequences, scoring_matrix, alignment,
+                                       processes=processes, chunk_size=5)
+            assert(scores.tolist() == expected)
+            assert(scores.dtype.name == 'int64')
+
+    skewed = {row: dict(cols) for row, cols in scoring_matrix.items()}
+    skewed['A']['C'] += 3
+    assert(is_symmetric(scoring_matrix) and not is_symmetric(skewed))
+    expected = [[compute_alignment_score(seq_x, seq_y, skewed, 'local')[0]
+                 for seq_y in sequences] for seq_x in sequences]
+    assert(all_vs_all_scores(sequences, skewed, 'local',
+                             processes=1).tolist() == expected)
+
+    with tempfile.TemporaryDirectory() as directory:
+        checkpoint = os.path.join(directory, 'scores.jsonl')
+        scores = all_vs_all_scores(sequences, scoring_matrix, 'local',
+                                   processes=1, chunk_size=5,
+                                   checkpoint=checkpoint)
+        with open(checkpoint) as checkpoint_file:
+            lines = checkpoint_file.readlines()
+        assert(len(lines) == 1 + 8)
+        with open(checkpoint, 'w') as checkpoint_file:
+            checkpoint_file.writelines(lines[:4] + ['[4, [1'])
+        resumed = all_vs_all_scores(sequences, scoring_matrix, 'local',
+                                    processes=1, chunk_size=5,
+                                    checkpoint=checkpoint)
+        assert(resumed.tolist() == scores.tolist())
+        try:
+            all_vs_all_scores(sequences, scoring_matrix, 'global',
+                              chunk_size=5, checkpoint=checkpoint)
+            assert(False)
+        except ValueError:
+            pass
+    assert(all_vs_all_scores([], scoring_matrix).shape == (0, 0))
+
+    return 'unit test 17 passes'
+
+
+def unit_test18():
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 10, 4, -6)
+    seq_x, seq_y = 'ACGTACGT', 'AGTACCGA'
+    exported = []
+
+    with Instrumentation(exported.append) as probe:
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'local')
+        result = compute_local_alignment(seq_x, seq_y, scoring_matrix,
+                                         alignment_matrix)
+        with Instrumentation() as inner:
+            compute_alignment_traceback(seq_x, seq_y, scoring_matrix)
+    compute_alignment_score(seq_x, seq_y, scoring_matrix)
+
+    assert(probe.calls == exported)
+    assert([stats.function for stats in probe.calls] ==
+           ['compute_alignment_matrix', 'compute_local_alignment',
+            'compute_alignment_traceback'])
+    assert(inner.calls == probe.calls[2:])
+    fill, backtrack, traceback = probe.calls
+    assert(fill.cells == 64 and set(fill.phases) == {'allocate', 'fill'})
+    assert(fill.peak_bytes > traceback.peak_bytes > 0)
+    assert(backtrack.cells == 81 + len(result[1]))
+    assert(set(backtrack.phases) == {'max_entry', 'traceback'})
+    assert(all(stats.seconds == sum(stats.phases.values()) and
+               stats.gcups >= 0 for stats in probe.calls))
+
+    with Instrumentation() as probe:
+        linear = compute_global_alignment_linear(seq_x, seq_y,
+                                                 scoring_matrix)
+        banded = compute_banded_global_alignment(seq_x, seq_y,
+                                                 scoring_matrix, band=2)
+        compute_banded_global_alignment(seq_x, seq_y, scoring_matrix)
+        alignments = compute_local_alignments(seq_x, seq_y, scoring_matrix, 3)
+    assert(linear == compute_global_alignment_linear(seq_x, seq_y,
+                                                     scoring_matrix))
+    assert(banded == compute_banded_global_alignment(seq_x, seq_y,
+                                                     scoring_matrix, band=2))
+    assert(alignments == compute_local_alignments(seq_x, seq_y,
+                                                  scoring_matrix, 3))
+    assert([stats.function for stats in probe.calls] ==
+           ['compute_global_alignment_linear',
+            'compute_banded_global_alignment',
+            'compute_banded_global_alignment', 'compute_local_alignments'])
+    linear, banded, _, local = probe.calls
+    assert(linear.cells > 64 and 'split' in linear.phases)
+    assert(banded.cells == 9 * 5 - 2 * 3)
+    assert(local.cells > 81 and set(local.phases) ==
+           {'allocate', 'fill', 'traceback', 'update'})
+    assert(all(stats.peak_bytes > 0 for stats in probe.calls))
+
+    from tools import _list_bytes
+    import sys
+    assert(_list_bytes([[1000, 2000]]) ==
+           sys.getsizeof([[]]) + sys.getsizeof([1000, 2000]) +
+           sys.getsizeof(1000) + sys.getsizeof(2000))
+
+    return 'unit test 18 passes'
+
+
+def unit_test19():
+    from tiled import compute_tiled_alignment, compute_tiled_alignment_score
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    rng = Random(5)
+    pairs = [('', ''), ('', 'ACD'), ('ACD', '')]
+    for _ in range(20):
+        seq_x = ''.join(rng.choice(fly_protein)
+                        for _ in range(rng.randint(1, 30)))
+        seq_y = seq_x[:rng.randint(0, len(seq_x))] + \
+            ''.join(rng.choice(fly_protein) for _ in range(rng.randint(1, 30)))
+        pairs.append((seq_x, seq_y))
+
+    for k, (seq_x, seq_y) in enumerate(pairs):
+        tile, processes = 1 + k % 7, 2 if k % 8 == 7 else 1
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix)
+        assert(compute_tiled_alignment_score(seq_x, seq_y, scoring_matrix,
+                                             'global', tile, processes) ==
+               (alignment_matrix[-1][-1], len(seq_x), len(seq_y)))
+        assert(compute_tiled_alignment(seq_x, seq_y, scoring_matrix,
+                                       'global', tile, processes) ==
+               compute_global_alignment(seq_x, seq_y, scoring_matrix,
+                                        alignment_matrix))
+
+        alignment_matrix = compute_alignment_matrix(seq_x, seq_y,
+                                                    scoring_matrix, 'local')
+        assert(compute_tiled_alignment_score(seq_x, seq_y, scoring_matrix,
+                                             'local', tile, processes) ==
+               max_entry(alignment_matrix))
+        assert(compute_tiled_alignment(seq_x, seq_y, scoring_matrix,
+                                       'local', tile, processes) ==
+               compute_local_alignment(seq_x, seq_y, scoring_matrix,
+                                       alignment_matrix))
+
+    return 'unit test 19 passes'
+
+
+def unit_test20():
+    from seeds import compute_xdrop_local_alignment
+
+    scoring_matrix = build_scoring_matrix(set('ACGT'), 5, -4, -6)
+    seq_x, seq_y = 'GATTACAGATC', 'CAGATTCAGAC'
+    score, align_x, align_y, cells = compute_xdrop_local_alignment(
+        seq_x, seq_y, scoring_matrix, 10**6, seed=(0, 0))
+    assert(score == max_entry(compute_alignment_matrix(seq_x, seq_y,
+                                                       scoring_matrix))[0])
+    assert(score == alignment_score(align_x, align_y, scoring_matrix))
+    assert(cells == (len(seq_x) + 1) * (len(seq_y) + 1) + 1)
+
+    scoring_matrix = read_scoring_matrix('alg_PAM50.txt')
+    human_protein = read_protein('alg_HumanEyelessProtein.txt')
+    fly_protein = read_protein('alg_FruitflyEyelessProtein.txt')
+    result = compute_xdrop_local_alignment(human_protein, fly_protein,
+                                           scoring_matrix, 20)
+    assert(result[:3] == compute_alignment_traceback(
+        human_protein, fly_protein, scoring_matrix, 'local'))
+    assert(result[3] * 50 < len(human_protein) * len(fly_protein))
+
+    # the cells include the pairs scored by the ungapped seed extensions,
+    # one per diagonal stretch
+    from seeds import KmerIndex, _ungapped_extensions
+    extensions, steps = _ungapped_extensions(
+        human_protein, KmerIndex({'y': fly_protein}, 3),
+        compile_scoring_matrix(scoring_matrix), 20)
+    best = max(extensions, key=lambda extension: extension[0])
+    seeded = compute_xdrop_local_alignment(human_protein, fly_protein,
+                                           scoring_matrix, 20,
+                                           seed=best[2:4])
+    assert(result == seeded[:3] + (seeded[3] + steps,))
+
+    return 'unit test 20 passes'
+
+
 if __name__ == '__main__':
     print(unit_test1())
     print(unit_test2())
+    print(unit_test3())
+    print(unit_test4())
+    print(unit_test5())
+    print(unit_test6())
+    print(unit_test7())
+    print(unit_test8())
+    print(unit_test9())
+    print(unit_test10())
+    print(unit_test11())
+    print(unit_test12())
+    print(unit_test13())
+    print(unit_test14())
+    print(unit_test15())
+    print(unit_test16())
+    print(unit_test17())
+    print(unit_test18())
+    print(unit_test19())
+    print(unit_test20())
     exit()
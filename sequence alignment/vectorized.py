@@ -0,0 +1,82 @@
+"""Vectorized (NumPy) computation of alignment matrices"""
+
+import numpy as np
+
+
+def dense_scoring_matrix(scoring_matrix):
+    """
+    dict -> tuple
+
+    Return (codes, scores) where 'codes' maps every symbol of the scoring
+    matrix 'scoring_matrix' (including '-') to a small integer and 'scores' is
+    a square ndarray with scores[codes[x], codes[y]] == scoring_matrix[x][y].
+    """
+    symbols = sorted(scoring_matrix)
+    codes = {symbol: code for code, symbol in enumerate(symbols)}
+    scores = np.array([[scoring_matrix[row][col] for col in symbols]
+                       for row in symbols], dtype=np.int64)
+    return codes, scores
+
+
+def encode(seq, codes):
+    """
+    (str, dict) -> ndarray
+
+    Return 'seq' as an array of the integer codes in 'codes'.
+    """
+    return np.array([codes[elem] for elem in seq], dtype=np.intp)
+
+
+def compute_alignment_matrix_vectorized(seq_x, seq_y, scoring_matrix,
+                                        alignment='global', as_list=False):
+    """
+    (str, str, dict, str, bool) -> ndarray
+
+    Input: two sequences 'seq_x' and 'seq_y' whose elements share a common
+    alphabet with the scoring matrix 'scoring_matrix'.
+
+    Return the same alignment matrix as compute_alignment_matrix, computing
+    each row with a few whole-array operations over integer-encoded sequences.
+
+    The diagonal and vertical moves only depend on the previous row. The
+    horizontal move is a running maximum: writing G for the cumulative sum of
+    the gap scores along 'seq_y' and t for the best of the other moves,
+    row[j] = G[j] + max(t[k] - G[k] for k <= j), which is one call to
+    np.maximum.accumulate.
+
+    The result is an (m+1) x (n+1) ndarray, which compute_global_alignment
+    and compute_local_alignment accept as is. Set 'as_list' to True to get a
+    list of lists instead.
+    """
+    codes, scores = dense_scoring_matrix(scoring_matrix)
+    x_length, y_length = len(seq_x), len(seq_y)
+    dash = codes['-']
+    local = alignment == 'local'
+
+    x_codes, y_codes = encode(seq_x, codes), encode(seq_y, codes)
+    profile = scores[:, y_codes]
+    gap_x = scores[x_codes, dash]
+    gap_sums = np.cumsum(np.concatenate(([0], scores[dash, y_codes])))
+
+    alignment_matrix = np.empty((x_length + 1, y_length + 1), dtype=np.int64)
+    if local:
+        alignment_matrix[0] = gap_sums + np.maximum.accumulate(-gap_sums)
+    else:
+        alignment_matrix[0] = gap_sums
+
+    best = np.empty(y_length + 1, dtype=np.int64)
+    diag = np.empty(y_length, dtype=np.int64)
+    for i in range(1, x_length+1):
+        prev = alignment_matrix[i-1]
+        np.add(prev, gap_x[i-1], out=best)
+        np.add(prev[:-1], profile[x_codes[i-1]], out=diag)
+        np.maximum(best[1:], diag, out=best[1:])
+        if local:
+            np.maximum(best, 0, out=best)
+        np.subtract(best, gap_sums, out=best)
+        np.maximum.accumulate(best, out=best)
+        np.add(best, gap_sums, out=alignment_matrix[i])
+
+    if as_list:
+        return alignment_matrix.tolist()
+    return alignment_matrix
@@ -0,0 +1,77 @@
+"""Bit-parallel (Myers) edit distance"""
+
+
+class BitPattern:
+    """
+    A query string compiled for Myers' bit-vector edit distance.
+
+    'masks[c]' has bit i set where query[i] == c. A column of the edit
+    distance matrix of the query against another string is stored as two
+    bit vectors of vertical differences (+1 and -1) between consecutive
+    entries, so each character of the other string costs a handful of
+    integer operations whatever the length of the query. Python integers
+    have no fixed width, so queries of any length are supported (words
+    under 64 characters fit in one machine word).
+
+    The masks are computed once and reused for every string the query is
+    compared with. pattern(word) is the same as pattern.distance(word).
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.length = len(query)
+        self.all_ones = (1 << self.length) - 1
+        self.high_bit = 1 << (self.length - 1) if query else 0
+        self.masks = {}
+        for i, char in enumerate(query):
+            self.masks[char] = self.masks.get(char, 0) | 1 << i
+
+    def distance(self, word, dist=None):
+        """
+        (str, int) -> int
+
+        Return the edit distance of the query and 'word'. If 'dist' is
+        given, return dist + 1 as soon as the distance is known to exceed
+        it: when the lengths differ by more than 'dist', or when the last
+        entry of a column exceeds 'dist' by more than the number of
+        characters left.
+        """
+        length = self.length
+        if dist is not None and abs(length - len(word)) > dist:
+            return dist + 1
+        if not length:
+            return len(word)
+
+        all_ones, high_bit, masks = self.all_ones, self.high_bit, self.masks
+        plus, minus, score = all_ones, 0, length
+        remaining = len(word)
+        for char in word:
+            eq = masks.get(char, 0)
+            xv = eq | minus
+            xh = (((eq & plus) + plus) ^ plus) | eq
+            horizontal_plus = minus | (~(xh | plus) & all_ones)
+            horizontal_minus = plus & xh
+            if horizontal_plus & high_bit:
+                score += 1
+            elif horizontal_minus & high_bit:
+                score -= 1
+            remaining -= 1
+            if dist is not None and score - remaining > dist:
+                return dist + 1
+            horizontal_plus = (horizontal_plus << 1 | 1) & all_ones
+            horizontal_minus = (horizontal_minus << 1) & all_ones
+            plus = horizontal_minus | (~(xv | horizontal_plus) & all_ones)
+            minus = horizontal_plus & xv
+        return score
+
+    __call__ = distance
+
+
+def bit_parallel_edit_distance(seq_x, seq_y):
+    """
+    (str, str) -> int
+
+    Return the edit distance of 'seq_x' and 'seq_y', the same as
+    edit_distance, with Myers' bit-vector algorithm.
+    """
+    return BitPattern(seq_x).distance(seq_y)
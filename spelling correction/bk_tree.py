@@ -0,0 +1,112 @@
+"""A BK-tree (metric tree) for looking up words within an edit distance"""
+
+
+class BKTree:
+    """
+    A Burkhard-Keller tree over a list of words for a metric 'distance'
+    (such as edit_distance).
+
+    If 'pattern' is given, it compiles a word once into a function of one
+    word returning their distance (such as BitPattern, for
+    bit_parallel_edit_distance), so that a query or an insertion reuses it
+    for every node it is compared with.
+
+    Every node holds a word, and its children are keyed by their distance
+    to it. By the triangle inequality, the words within 'dist' of a query at
+    distance d from a node can only be found below the children keyed d-dist
+    to d+dist, so a query only visits those subtrees.
+
+    The tree is stored as the list 'words', in insertion order, with
+    'parents[k]' the index of the parent of words[k] (-1 for the root) and
+    'distances[k]' its distance to that parent. save() writes these lists
+    to a file and load() rebuilds the tree from it without computing any
+    distance.
+    """
+
+    def __init__(self, words=(), distance=None, pattern=None):
+        self.distance = distance
+        self.pattern = pattern
+        self.words, self.parents, self.distances = [], [], []
+        self.children = []
+        self.visited = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return bool(self.query(word, 0))
+
+    def _compile(self, word):
+        """Return the function of one word returning its distance to 'word'."""
+        if self.pattern is not None:
+            return self.pattern(word)
+        return lambda other: self.distance(word, other)
+
+    def _link(self, word, parent, distance):
+        """Append the node 'word' below the node 'parent'."""
+        if parent >= 0:
+            self.children[parent][distance] = len(self.words)
+        self.words.append(word)
+        self.parents.append(parent)
+        self.distances.append(distance)
+        self.children.append({})
+
+    def add(self, word):
+        """Insert 'word' into the tree, unless it is already there."""
+        if not self.words:
+            self._link(word, -1, 0)
+            return
+        measure = self._compile(word)
+        node = 0
+        while True:
+            distance = measure(self.words[node])
+            if distance == 0:
+                return
+            child = self.children[node].get(distance)
+            if child is None:
+                self._link(word, node, distance)
+                return
+            node = child
+
+    def query(self, word, dist):
+        """
+        (str, int) -> set
+
+        Return the set of words of the tree within distance 'dist' of 'word'.
+        The number of words compared with 'word' is left in 'visited'.
+        """
+        result = set()
+        self.visited = 0
+        measure = self._compile(word)
+        stack = [0] if self.words else []
+        while stack:
+            node = stack.pop()
+            self.visited += 1
+            distance = measure(self.words[node])
+            if distance <= dist:
+                result.add(self.words[node])
+            for child_distance, child in self.children[node].items():
+                if distance - dist <= child_distance <= distance + dist:
+                    stack.append(child)
+        return result
+
+    def save(self, filename):
+        """
+        Write the tree to 'filename', one line per word: the word, the index
+        of its parent and its distance to it, separated by tabs.
+        """
+        with open(filename, 'w') as tree_file:
+            for node in zip(self.words, self.parents, self.distances):
+                tree_file.write('{}\t{}\t{}\n'.format(*node))
+
+    @classmethod
+    def load(cls, filename, distance, pattern=None):
+        """Return the BKTree for 'distance' saved in 'filename'."""
+        tree = cls(distance=distance, pattern=pattern)
+        with open(filename) as tree_file:
+            for line in tree_file:
+                word, parent, node_distance = line.rstrip('\n').split('\t')
+                tree._link(word, int(parent), int(node_distance))
+        return tree
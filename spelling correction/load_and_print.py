@@ -1,8 +1,14 @@
 """Some tools for measuring the edit distance of two strings"""
 
+import os
 import string
 from timeit import default_timer
+from bit_parallel import BitPattern, bit_parallel_edit_distance
+from bk_tree import BKTree
+from symspell import DeletionIndex
 from tools import *
+from trie import Trie
+from word_store import WordStore, write_word_store
 
 
 def edit_distance(seq_x, seq_y):
@@ -24,6 +30,39 @@ def edit_distance(seq_x, seq_y):
     return len(seq_x) + len(seq_y) - s
 
 
+def bounded_edit_distance(seq_x, seq_y, dist):
+    """
+    (str, str, int) -> int
+
+    Return the edit distance of 'seq_x' and 'seq_y' if it is at most 'dist',
+    else dist + 1.
+
+    Strings whose lengths differ by more than 'dist' are rejected without
+    any alignment. Otherwise only the band of 2*dist + 1 diagonals around
+    the main one is filled (an entry further away is at least its distance
+    to the diagonal), with the entries above 'dist' capped to dist + 1, and
+    the fill stops as soon as a whole row exceeds 'dist'.
+    """
+    x_length, y_length = len(seq_x), len(seq_y)
+    limit = dist + 1
+    if abs(x_length - y_length) > dist:
+        return limit
+
+    prev = [min(j, limit) for j in range(y_length + 1)]
+    for i in range(1, x_length + 1):
+        x = seq_x[i-1]
+        low, high = max(1, i - dist), min(y_length, i + dist)
+        row = [limit] * (y_length + 1)
+        row[0] = min(i, limit)
+        for j in range(low, high + 1):
+            row[j] = min(prev[j-1] + (x != seq_y[j-1]), prev[j] + 1,
+                         row[j-1] + 1, limit)
+        if row[0] > dist and min(row[low:high+1]) > dist:
+            return limit
+        prev = row
+    return prev[y_length]
+
+
 def read_words(filename):
     """Load word list from the file and return list of strings."""
     # word_file = urllib2.urlopen(filename)
@@ -35,14 +74,47 @@ def read_words(filename):
     return word_list
 
 
+def read_word_tree(filename, tree_filename=None):
+    """
+    Return a BKTree of the words in the file 'filename' for
+    bit_parallel_edit_distance, which compiles the BitPattern of a query
+    once for all the nodes it is compared with.
+
+    The tree is loaded from 'tree_filename' (by default the name of the word
+    file plus '.bk') and only built, then saved, when that file is missing
+    or older than the word file.
+    """
+    tree_filename = tree_filename or filename + '.bk'
+    if os.path.exists(tree_filename) and \
+            os.path.getmtime(tree_filename) >= os.path.getmtime(filename):
+        return BKTree.load(tree_filename, bit_parallel_edit_distance,
+                           BitPattern)
+    tree = BKTree(read_words(filename), bit_parallel_edit_distance,
+                  BitPattern)
+    try:
+        tree.save(tree_filename)
+    except OSError:
+        pass
+    return tree
+
+
 def check_spelling(checked_word, dist, word_list):
     """
     Iterate through 'word_list' and returns the set of words that are within
-    an edit distance 'dist' of the string 'checked_word'.
+    an edit distance 'dist' of the string 'checked_word', using the
+    bit-parallel edit distance of a BitPattern of 'checked_word' compiled
+    once for the whole list, bounded by 'dist'.
+
+    'word_list' can also be a BKTree (see read_word_tree), which only
+    compares 'checked_word' with the words the triangle inequality allows,
+    or a Trie, which shares the work on common prefixes, or a WordStore.
     """
+    if isinstance(word_list, (BKTree, Trie, WordStore)):
+        return word_list.query(checked_word, dist)
     result = set([])
+    pattern = BitPattern(checked_word)
     for word in word_list:
-        if edit_distance(checked_word, word) <= dist:
+        if pattern.distance(word, dist) <= dist:
             result.add(word)
     return result
 
@@ -53,14 +125,75 @@ def example1():
     print(check_spelling("firefly", 2, words))
 
 
+def read_word_index(filename, index_filename=None, max_distance=2):
+    """
+    Return a DeletionIndex of the words in the file 'filename' for
+    bounded_edit_distance.
+
+    The index is loaded from 'index_filename' (by default the name of the
+    word file plus '.del') and only built, then saved, when that file is
+    missing, older than the word file or built for a smaller
+    'max_distance'.
+    """
+    index_filename = index_filename or filename + '.del'
+    if os.path.exists(index_filename) and \
+            os.path.getmtime(index_filename) >= os.path.getmtime(filename):
+        index = DeletionIndex.load(index_filename, bounded_edit_distance)
+        if index.max_distance >= max_distance:
+            return index
+    index = DeletionIndex(read_words(filename), bounded_edit_distance,
+                          max_distance)
+    try:
+        index.save(index_filename)
+    except OSError:
+        pass
+    return index
+
+
+def read_word_store(filename, store_filename=None, deletion_distance=2):
+    """
+    Return a WordStore of the words in the file 'filename' for
+    bounded_edit_distance, memory-mapped from the binary file
+    'store_filename' (by default the name of the word file plus '.dict').
+
+    The binary file is only written, with a deletion section for up to
+    'deletion_distance' deletions, when it is missing, older than the word
+    file, in another format or has a smaller deletion section.
+    """
+    store_filename = store_filename or filename + '.dict'
+    if os.path.exists(store_filename) and \
+            os.path.getmtime(store_filename) >= os.path.getmtime(filename):
+        try:
+            store = WordStore(store_filename, bounded_edit_distance)
+        except ValueError:
+            store = None
+        if store is not None:
+            if store.deletion_distance >= deletion_distance:
+                return store
+            store.close()
+    write_word_store(store_filename, read_words(filename), deletion_distance)
+    return WordStore(store_filename, bounded_edit_distance)
+
+
 def quick_check(checked_word, word_list, dist=1):
     """
     Return words of edit distance 1 or 2 from checked_word in word_list.
 
     Adapted from P. Norvig 'How to Write a Spelling Corrector' 2007
     http://norvig.com/spell-correct.html
+
+    'word_list' can also be a set of words, which is used as is, or a
+    DeletionIndex (see read_word_index), which only generates deletions of
+    'checked_word' and works for any alphabet and distance up to its
+    max_distance, or a WordStore (see read_word_store) with a deletion
+    section.
     """
-    word_set = set(word_list)
+    if isinstance(word_list, (DeletionIndex, WordStore)):
+        return list(word_list.query(checked_word, dist))
+    if isinstance(word_list, (set, frozenset)):
+        word_set = word_list
+    else:
+        word_set = set(word_list)
 
     def edit_one(word):
         alphabet = string.ascii_lowercase
@@ -74,13 +207,13 @@ def quick_check(checked_word, word_list, dist=1):
         return set([word2 for word1 in edit_one(word) for word2 in edit_one(word1)])
 
     if dist == 1:
-        return [word for word in edit_one(checked_word) if word in word_list]
+        return [word for word in edit_one(checked_word) if word in word_set]
     elif dist == 2:
-        return [word for word in edit_two(checked_word) if word in word_list]
+        return [word for word in edit_two(checked_word) if word in word_set]
 
 
 def example2():
-    words = read_words('assets_scrabble_words3.txt')
+    words = read_word_store('assets_scrabble_words3.txt')
     print(quick_check("humble", words))
     print(quick_check("firefly", words))
 
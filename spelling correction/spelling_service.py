@@ -0,0 +1,217 @@
+"""Batch spelling correction of token streams"""
+
+import os
+import re
+import sys
+from collections import OrderedDict, deque, namedtuple
+from contextlib import redirect_stdout
+from itertools import islice
+from multiprocessing import Pool
+from timeit import default_timer
+from load_and_print import bounded_edit_distance, read_word_store
+from word_store import WordStore
+
+# Tokens are runs of letters, in any alphabet
+TOKEN = re.compile(r'[^\W\d_]+')
+
+ServiceStats = namedtuple('ServiceStats', ['tokens', 'known', 'cache_hits',
+                                           'corrected', 'seconds',
+                                           'tokens_per_second'])
+
+_STORE = None
+_DIST = None
+
+
+def read_tokens(stream):
+    """Yield the tokens of the text 'stream' one line at a time."""
+    for line in stream:
+        yield from TOKEN.findall(line)
+
+
+def _init_worker(store_filename, dist):
+    """Open the word store in a worker process of correct_tokens."""
+    global _STORE, _DIST
+    _STORE = WordStore(store_filename, bounded_edit_distance)
+    _DIST = dist
+
+
+def _correct_words(words):
+    """
+    Return, for each of 'words', the list of the words of the store within
+    the edit distance, closest first, then in alphabetical order.
+    """
+    return [sorted(_STORE.query(word, _DIST),
+                   key=lambda candidate: (
+                       bounded_edit_distance(word, candidate, _DIST),
+                       candidate))
+            for word in words]
+
+
+class _Ready:
+    """The result of a job run in this process, like an AsyncResult."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def correct_tokens(tokens, store_filename, dist=1, processes=None,
+                   cache_size=10000, chunk_size=1024, counts=None):
+    """
+    Input: an iterable of 'tokens' and the name of a word store written by
+    write_word_store (see read_word_store).
+
+    Yield (token, corrections) for every token, in input order, where
+    corrections is the list of the words within edit distance 'dist' of the
+    lower case token, closest first: [word] for a word of the dictionary.
+
+    Tokens are read 'chunk_size' at a time. Dictionary words are recognized
+    in constant time by the hash table of the memory-mapped store, so no
+    word of the store is decoded at startup, and the corrections of the
+    last 'cache_size' distinct words, dictionary words included, are kept
+    in an LRU cache: only the misspellings not seen recently are sent, once
+    per chunk, to a pool of 'processes' worker processes (by default one
+    per core, processes=1 corrects in this process) that share the
+    memory-mapped store. A few chunks are in flight at once and are written
+    out in order.
+
+    If 'counts' is a dictionary, the numbers of 'tokens', 'known' words,
+    'cache_hits' and misspellings 'corrected' by the workers are added to
+    it.
+    """
+    store = WordStore(store_filename)
+    cache = OrderedDict()
+    counts = {} if counts is None else counts
+    for key in ('tokens', 'known', 'cache_hits', 'corrected'):
+        counts.setdefault(key, 0)
+
+    tokens = iter(tokens)
+    pending, window = {}, deque()
+    pool = None
+    if processes != 1:
+        pool = Pool(processes, _init_worker, (store_filename, dist))
+        max_pending = 2 * (processes or os.cpu_count() or 1)
+    else:
+        _init_worker(store_filename, dist)
+        max_pending = 1
+
+    def remember(word, corrections):
+        """Add the 'corrections' of 'word' to the LRU cache."""
+        cache[word] = corrections
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+
+    def submit(batch):
+        """
+        Send the new misspellings of 'batch' to the workers and return the
+        batch with the source of the corrections of each of its tokens.
+        """
+        words, sources, known = [], [], 0
+        for token in batch:
+            word = token.lower()
+            if word in cache:
+                cache.move_to_end(word)
+                source = cache[word]
+                known += source == [word]
+            elif word in pending:
+                source = word
+            elif word in store:
+                known += 1
+                source = [word]
+                remember(word, source)
+            else:
+                pending[word] = None
+                words.append(word)
+                source = word
+            sources.append(source)
+        if pool is not None:
+            result = pool.apply_async(_correct_words, (words,))
+        else:
+            result = _Ready(_correct_words(words))
+        for index, word in enumerate(words):
+            pending[word] = (result, index)
+        sources = [pending[source] if isinstance(source, str) else source
+                   for source in sources]
+        counts['tokens'] += len(batch)
+        counts['known'] += known
+        counts['cache_hits'] += len(batch) - known - len(words)
+        counts['corrected'] += len(words)
+        return (batch, sources, words, result)
+
+    def emit(batch, sources, words, result):
+        """Yield the corrections of 'batch' and cache its new ones."""
+        for word, corrections in zip(words, result.get()):
+            del pending[word]
+            remember(word, corrections)
+        for token, source in zip(batch, sources):
+            if isinstance(source, tuple):
+                job, index = source
+                source = job.get()[index]
+            yield (token, source)
+
+    try:
+        while True:
+            batch = list(islice(tokens, chunk_size))
+            if not batch:
+                break
+            window.append(submit(batch))
+            if len(window) >= max_pending:
+                yield from emit(*window.popleft())
+        while window:
+            yield from emit(*window.popleft())
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        store.close()
+
+
+def correct_stream(input_stream, output_stream, store_filename, dist=1,
+                   processes=None, cache_size=10000, chunk_size=1024):
+    """
+    Correct the tokens of the text 'input_stream' with correct_tokens and
+    write one line per token to 'output_stream': the token, a tab and its
+    corrections separated by spaces.
+
+    Return a ServiceStats tuple with the counts of correct_tokens, the time
+    taken in seconds and the throughput in tokens per second.
+    """
+    counts = {}
+    start = default_timer()
+    for token, corrections in correct_tokens(
+            read_tokens(input_stream), store_filename, dist, processes,
+            cache_size, chunk_size, counts):
+        output_stream.write(token + '\t' + ' '.join(corrections) + '\n')
+    seconds = default_timer() - start
+    return ServiceStats(counts['tokens'], counts['known'],
+                        counts['cache_hits'], counts['corrected'], seconds,
+                        counts['tokens'] / seconds if seconds else 0.0)
+
+
+def main(filename=None):
+    """
+    Correct the text in the file 'filename' (by default the standard input)
+    against the Scrabble word list and report the throughput.
+    """
+    with redirect_stdout(sys.stderr):
+        store = read_word_store('assets_scrabble_words3.txt')
+    store.close()
+    if filename is None:
+        stats = correct_stream(sys.stdin, sys.stdout, store.filename)
+    else:
+        with open(filename) as input_file:
+            stats = correct_stream(input_file, sys.stdout, store.filename)
+    sys.stderr.write('{} tokens ({} known, {} cached, {} corrected) in '
+                     '{:.2f}s: {:.0f} tokens/s\n'.format(
+                         stats.tokens, stats.known, stats.cache_hits,
+                         stats.corrected, stats.seconds,
+                         stats.tokens_per_second))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        sys.stderr.write('usage: {0} [file]\n'.format(sys.argv[0]))
+        sys.exit(1)
+    main(sys.argv[1] if len(sys.argv) == 2 else None)
@@ -0,0 +1,107 @@
+"""A symmetric deletion index (SymSpell) for looking up words"""
+
+
+def deletions(word, max_distance):
+    """
+    (str, int) -> set
+
+    Return the set of strings obtained by deleting at most 'max_distance'
+    characters from 'word', 'word' included.
+    """
+    result, current = {word}, {word}
+    for _ in range(max_distance):
+        current = {item[:k] + item[k+1:] for item in current
+                   for k in range(len(item))} - result
+        result |= current
+    return result
+
+
+class DeletionIndex:
+    """
+    An index of the words of a list by the strings obtained by deleting up to
+    'max_distance' characters from their first 'prefix_length' characters.
+
+    Two words within edit distance d share such a string with at most d
+    deletions on each side (a substitution is a deletion from both words, an
+    insertion a deletion from the other one), and so do their prefixes. A
+    query therefore only generates the deletions of its own prefix, for any
+    alphabet, and checks the words indexed under them with 'distance', a
+    bounded edit distance called as distance(word, candidate, dist) (such as
+    bounded_edit_distance).
+
+    save() writes the index to a file and load() reads it back, so it is
+    only built once. Words must not contain tabs or line breaks.
+    """
+
+    def __init__(self, words=(), distance=None, max_distance=2,
+                 prefix_length=7):
+        self.distance = distance
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self.index = {}
+        self.words = set()
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self, word):
+        return word in self.words
+
+    def add(self, word):
+        """Index 'word' under the deletions of its prefix."""
+        if word in self.words:
+            return
+        self.words.add(word)
+        for key in deletions(word[:self.prefix_length], self.max_distance):
+            self.index.setdefault(key, []).append(word)
+
+    def query(self, word, dist):
+        """
+        (str, int) -> set
+
+        Return the set of indexed words within edit distance 'dist' of
+        'word'. 'dist' cannot exceed 'max_distance'.
+        """
+        if dist > self.max_distance:
+            raise ValueError('dist {} exceeds the max_distance {} of the '
+                             'index'.format(dist, self.max_distance))
+        result, checked = set(), set()
+        for key in deletions(word[:self.prefix_length], dist):
+            for candidate in self.index.get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if abs(len(candidate) - len(word)) <= dist and \
+                        self.distance(word, candidate, dist) <= dist:
+                    result.add(candidate)
+        return result
+
+    def save(self, filename):
+        """
+        Write the index to 'filename': a first line with 'max_distance' and
+        'prefix_length', a line with the words, then one line per key with
+        the words indexed under it, separated by tabs.
+        """
+        with open(filename, 'w') as index_file:
+            index_file.write('{}\t{}\n'.format(self.max_distance,
+                                               self.prefix_length))
+            index_file.write('\t'.join(self.words) + '\n')
+            for key, words in self.index.items():
+                index_file.write(key + '\t' + '\t'.join(words) + '\n')
+
+    @classmethod
+    def load(cls, filename, distance):
+        """Return the DeletionIndex for 'distance' saved in 'filename'."""
+        with open(filename) as index_file:
+            max_distance, prefix_length = map(
+                int, index_file.readline().split('\t'))
+            index = cls(distance=distance, max_distance=max_distance,
+                        prefix_length=prefix_length)
+            words = index_file.readline().rstrip('\n')
+            index.words = set(words.split('\t')) if words else set()
+            for line in index_file:
+                key, *words = line.rstrip('\n').split('\t')
+                index.index[key] = words
+        return index
@@ -0,0 +1,78 @@
+"""A trie of words searched for the words within an edit distance"""
+
+# Key of the word ending at a node of a Trie
+END = ''
+
+
+class Trie:
+    """
+    A trie over a list of words: nested dictionaries mapping characters to
+    the nodes below, where the node reached by the characters of a word
+    maps END to the word.
+
+    query() walks the trie carrying one row of the edit distance matrix of
+    the query against the prefix spelled by each node, so words sharing a
+    prefix share the rows computed for it.
+    """
+
+    def __init__(self, words=()):
+        self.root = {}
+        self.size = 0
+        self.visited = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, word):
+        node = self.root
+        for char in word:
+            node = node.get(char)
+            if node is None:
+                return False
+        return END in node
+
+    def add(self, word):
+        """Insert 'word' into the trie."""
+        node = self.root
+        for char in word:
+            node = node.setdefault(char, {})
+        if END not in node:
+            node[END] = word
+            self.size += 1
+
+    def query(self, word, dist):
+        """
+        (str, int) -> set
+
+        Return the set of words of the trie within edit distance 'dist' of
+        'word'.
+
+        The row of a node is computed from the row of its parent in
+        O(len(word)), and the branch below it is pruned as soon as the
+        smallest entry of the row exceeds 'dist', since extending the prefix
+        can only increase it. The number of nodes visited is left in
+        'visited'.
+        """
+        result = set()
+        first = list(range(len(word) + 1))
+        if END in self.root and first[-1] <= dist:
+            result.add(self.root[END])
+        self.visited = 1
+        stack = [(self.root, first)]
+        while stack:
+            node, prev = stack.pop()
+            for char, child in node.items():
+                if char == END:
+                    continue
+                self.visited += 1
+                row = [prev[0] + 1]
+                for j, x in enumerate(word, 1):
+                    row.append(min(prev[j] + 1, row[j-1] + 1,
+                                   prev[j-1] + (x != char)))
+                if END in child and row[-1] <= dist:
+                    result.add(child[END])
+                if min(row) <= dist:
+                    stack.append((child, row))
+        return result
@@ -0,0 +1,264 @@
+from load_and_print import *
+
+
+def unit_test1():
+    import tempfile
+    words = read_words('assets_scrabble_words3.txt')[::40]
+    tree = BKTree(words, bit_parallel_edit_distance, BitPattern)
+    assert(len(tree) == len(set(words)))
+
+    for checked_word in ['humble', 'firefly', 'qzx', words[100], '']:
+        for dist in range(3):
+            assert(check_spelling(checked_word, dist, tree) ==
+                   check_spelling(checked_word, dist, words))
+    tree.query('humble', 1)
+    assert(tree.visited * 3 < len(tree))
+    assert(words[100] in tree and 'qzx' not in tree)
+
+    with tempfile.TemporaryDirectory() as directory:
+        tree_filename = directory + '/words.bk'
+        tree.save(tree_filename)
+        loaded = BKTree.load(tree_filename, bit_parallel_edit_distance,
+                             BitPattern)
+    assert(loaded.words == tree.words and loaded.children == tree.children)
+    assert(loaded.query('firefly', 2) == tree.query('firefly', 2))
+
+    plain = BKTree(words[:500], bit_parallel_edit_distance)
+    assert(plain.children == BKTree(words[:500], bit_parallel_edit_distance,
+                                    BitPattern).children)
+    assert(plain.query('humble', 2) == check_spelling('humble', 2,
+                                                       words[:500]))
+
+    return 'unit test 1 passes'
+
+
+def unit_test2():
+    from random import Random
+    assert(bounded_edit_distance('kitten', 'sitting', 3) == 3)
+    assert(bounded_edit_distance('kitten', 'sitting', 2) == 3)
+    assert(bounded_edit_distance('humble', 'humbles', 0) == 1)
+    assert(bounded_edit_distance('a', 'abcd', 2) == 3)
+    assert(bounded_edit_distance('', '', 0) == 0)
+
+    rng = Random(1)
+    for _ in range(500):
+        seq_x = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 8)))
+        seq_y = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 8)))
+        dist = rng.randint(0, 5)
+        assert(bounded_edit_distance(seq_x, seq_y, dist) ==
+               min(edit_distance(seq_x, seq_y), dist + 1))
+
+    words = read_words('assets_scrabble_words3.txt')[::40]
+    assert(check_spelling('humble', 1, words) ==
+           {word for word in words if edit_distance('humble', word) <= 1})
+
+    return 'unit test 2 passes'
+
+
+def unit_test3():
+    words = read_words('assets_scrabble_words3.txt')
+    trie = Trie(words)
+    assert(len(trie) == len(set(words)))
+    assert('firefly' in trie and 'firef' not in trie)
+
+    sample = words[::40]
+    small = Trie(sample + [''])
+    for checked_word in ['humble', 'firefly', 'qzx', sample[100], '']:
+        for dist in range(3):
+            assert(check_spelling(checked_word, dist, small) ==
+                   check_spelling(checked_word, dist, sample + ['']))
+
+    assert(check_spelling('firefly', 2, trie) ==
+           check_spelling('firefly', 2, words))
+    assert(trie.visited * 10 < sum(len(word) for word in words))
+
+    return 'unit test 3 passes'
+
+
+def unit_test4():
+    import tempfile
+    from random import Random
+    words = read_words('assets_scrabble_words3.txt')
+    index = DeletionIndex(words[::10] + ['café', 'señor', 'naïve'],
+                          bounded_edit_distance, max_distance=2,
+                          prefix_length=5)
+    sample = words[::10] + ['café', 'señor', 'naïve']
+
+    rng = Random(2)
+    queries = ['humble', 'firefly', 'qzx', '', 'cafe', 'senior', 'naive']
+    for word in rng.sample(sample, 50):
+        queries.append(''.join(char if rng.random() > 0.2 else
+                               rng.choice('aeixyzé') for char in word))
+    for checked_word in queries:
+        for dist in range(3):
+            assert(index.query(checked_word, dist) ==
+                   check_spelling(checked_word, dist, sample))
+    try:
+        index.query('humble', 3)
+        assert(False)
+    except ValueError:
+        pass
+
+    assert(sorted(quick_check('humble', index)) ==
+           sorted(quick_check('humble', set(sample))) ==
+           sorted(quick_check('humble', sample)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        index_filename = directory + '/words.del'
+        index.save(index_filename)
+        loaded = DeletionIndex.load(index_filename, bounded_edit_distance)
+    assert(loaded.index == index.index and loaded.words == index.words)
+    assert((loaded.max_distance, loaded.prefix_length) == (2, 5))
+
+    return 'unit test 4 passes'
+
+
+def unit_test5():
+    import pickle
+    import tempfile
+    words = read_words('assets_scrabble_words3.txt')[::10]
+    words += ['café', 'señor']
+    index = DeletionIndex(words, bounded_edit_distance)
+
+    with tempfile.TemporaryDirectory() as directory:
+        plain_filename = directory + '/plain.dict'
+        write_word_store(plain_filename, words)
+        write_word_store(directory + '/words.dict', words, 2)
+        with WordStore(directory + '/words.dict',
+                       bounded_edit_distance) as store, \
+                WordStore(plain_filename, bounded_edit_distance) as plain:
+            assert(len(store) == len(plain) == len(set(words)))
+            assert(list(store) == sorted(set(words), key=lambda word: (
+                len(word), word.encode('utf-8'))))
+            assert(store[store.find('café')] == 'café')
+            assert('señor' in store and 'senor' not in plain)
+            assert(all(len(store[k]) == 4 for k in store.length_range(4)))
+            assert(store.deletion_distance == 2)
+            assert(plain.deletion_distance == 0)
+
+            for checked_word in ['humble', 'firefly', 'qzx', '', 'cafe',
+                                 words[100], words[200] + 's']:
+                for dist in range(3):
+                    expected = index.query(checked_word, dist)
+                    assert(store.query(checked_word, dist) == expected)
+                    assert(check_spelling(checked_word, dist, plain) ==
+                           expected)
+            assert(sorted(quick_check('humble', store)) ==
+                   sorted(quick_check('humble', set(words))))
+
+            copy = pickle.loads(pickle.dumps(store))
+            assert(copy.query('firefly', 2) == store.query('firefly', 2))
+            copy.close()
+
+            assert(all(store.find(word) == k for k, word in enumerate(store)))
+            assert(store.find('qzx') == -1 and '' not in store)
+
+        for empty in [[], ['']]:
+            write_word_store(directory + '/empty.dict', empty)
+            with WordStore(directory + '/empty.dict') as store:
+                assert(list(store) == empty and 'a' not in store)
+                assert(('' in store) == bool(empty))
+
+        word_filename = directory + '/words.txt'
+        with open(word_filename, 'w') as word_file:
+            word_file.write('humble\nfirefly\n')
+        with open(word_filename + '.dict', 'wb') as store_file:
+            store_file.write(b'WORDS\x00\x00\x01' + bytes(40))
+        try:
+            WordStore(word_filename + '.dict')
+            assert(False)
+        except ValueError:
+            pass
+        with read_word_store(word_filename) as store:
+            assert('firefly' in store and len(store) == 2)
+
+    return 'unit test 5 passes'
+
+
+def unit_test6():
+    import io
+    import tempfile
+    from spelling_service import correct_stream, correct_tokens, read_tokens
+
+    words = read_words('assets_scrabble_words3.txt')[::10] + \
+        ['the', 'and', 'bee', 'humble', 'firefly', 'fireflies']
+    text = ('The humble firefly, the hunble fierfly and the HUNBLE bee.\n'
+            'Hunble 42 fireflys:\thumble!\n')
+    tokens = list(read_tokens(io.StringIO(text)))
+    assert(tokens[:4] == ['The', 'humble', 'firefly', 'the'])
+    assert(len(tokens) == 13)
+
+    with tempfile.TemporaryDirectory() as directory:
+        store_filename = directory + '/words.dict'
+        write_word_store(store_filename, words, 2)
+        expected = []
+        for token in tokens:
+            word = token.lower()
+            corrections = check_spelling(word, 1, words)
+            expected.append((token, [word] if word in corrections else
+                             sorted(corrections, key=lambda candidate: (
+                                 edit_distance(word, candidate), candidate))))
+
+        for processes, chunk_size in [(1, 1), (1, 5), (2, 3)]:
+            counts = {}
+            assert(list(correct_tokens(tokens, store_filename, 1, processes,
+                                       cache_size=10, chunk_size=chunk_size,
+                                       counts=counts)) == expected)
+            assert(counts['tokens'] == 13 and
+                   counts['known'] + counts['cache_hits'] +
+                   counts['corrected'] == 13)
+        assert(counts['corrected'] == len(
+            {token.lower() for token, corrections in expected
+             if corrections != [token.lower()]}))
+        assert(list(correct_tokens(tokens, store_filename, 1, 1,
+                                   cache_size=1, chunk_size=13)) == expected)
+
+        output = io.StringIO()
+        stats = correct_stream(io.StringIO(text), output, store_filename,
+                               processes=1)
+        assert(stats.tokens == 13 and stats.tokens_per_second > 0)
+        assert(output.getvalue().splitlines()[1] == 'humble\thumble')
+
+    return 'unit test 6 passes'
+
+
+def unit_test7():
+    from random import Random
+    assert(bit_parallel_edit_distance('kitten', 'sitting') == 3)
+    assert(bit_parallel_edit_distance('', 'abc') == 3)
+    assert(bit_parallel_edit_distance('abc', '') == 3)
+    assert(bit_parallel_edit_distance('', '') == 0)
+
+    rng = Random(3)
+    for _ in range(500):
+        seq_x = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 12)))
+        seq_y = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 12)))
+        distance = edit_distance(seq_x, seq_y)
+        assert(bit_parallel_edit_distance(seq_x, seq_y) == distance)
+        dist = rng.randint(0, 4)
+        assert(BitPattern(seq_x).distance(seq_y, dist) ==
+               min(distance, dist + 1))
+
+    seq_x, seq_y = 'x' * 70 + 'abc' * 30, 'y' * 65 + 'abd' * 31
+    assert(bit_parallel_edit_distance(seq_x, seq_y) ==
+           edit_distance(seq_x, seq_y))
+
+    words = read_words('assets_scrabble_words3.txt')[::10]
+    pattern = BitPattern('firefly')
+    assert(check_spelling('firefly', 2, words) ==
+           {word for word in words if pattern.distance(word) <= 2} ==
+           {word for word in words
+            if bounded_edit_distance('firefly', word, 2) <= 2})
+
+    return 'unit test 7 passes'
+
+
+if __name__ == '__main__':
+    print(unit_test1())
+    print(unit_test2())
+    print(unit_test3())
+    print(unit_test4())
+    print(unit_test5())
+    print(unit_test6())
+    print(unit_test7())
+    exit()
@@ -0,0 +1,277 @@
+"""A compact, memory-mapped binary format for word lists"""
+
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from symspell import deletions
+
+MAGIC = b'WORDS\x00\x00\x02'
+
+# magic, byte order ('<' or '>'), word count, maximum word length, start of
+# the word offsets, start of the word data, start of the hash table, its
+# number of slots, start of the deletion section (0 if there is none), its
+# max_distance and its prefix_length
+HEADER = struct.Struct('<8scIIIIIIIII')
+
+
+def _table(values):
+    """Return the bytes of 'values' as unsigned 32-bit integers."""
+    return array('I', values).tobytes()
+
+
+def _pad(data):
+    """Pad the bytearray 'data' with zeros to a multiple of 4 bytes."""
+    data.extend(bytes(-len(data) % 4))
+
+
+def write_word_store(filename, words, deletion_distance=None,
+                     prefix_length=7):
+    """
+    Write the set of 'words' to the file 'filename' in the format read by
+    WordStore.
+
+    The words are encoded in UTF-8, sorted by length (in characters) then by
+    bytes, and stored in one contiguous buffer described by a table of
+    offsets and a table of the first word of every length. An open
+    addressing hash table of at least twice as many slots as words holds
+    the ordinal plus one of every word (0 for an empty slot) at the CRC-32
+    of its bytes, or the next free slot. If
+    'deletion_distance' is given, a prebuilt DeletionIndex section is added
+    for deletions of up to 'deletion_distance' characters from the first
+    'prefix_length' characters of every word.
+    """
+    words = sorted(set(words), key=lambda word: (len(word),
+                                                 word.encode('utf-8')))
+    max_length = len(words[-1]) if words else 0
+    buckets = [0] * (max_length + 2)
+    for word in words:
+        buckets[len(word) + 1] += 1
+    for length in range(1, max_length + 2):
+        buckets[length] += buckets[length - 1]
+
+    body = bytearray(_table(buckets))
+    offsets_start = HEADER.size + len(body)
+    encoded = [word.encode('utf-8') for word in words]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    body += _table(offsets)
+    data_start = HEADER.size + len(body)
+    body += b''.join(encoded)
+    _pad(body)
+
+    hash_start = HEADER.size + len(body)
+    slots = 1
+    while slots < 2 * len(words):
+        slots *= 2
+    table = [0] * slots
+    for ordinal, data in enumerate(encoded):
+        slot = zlib.crc32(data) & (slots - 1)
+        while table[slot]:
+            slot = (slot + 1) & (slots - 1)
+        table[slot] = ordinal + 1
+    body += _table(table)
+
+    deletion_start = 0
+    if deletion_distance is not None:
+        deletion_start = HEADER.size + len(body)
+        postings = {}
+        for ordinal, word in enumerate(words):
+            for key in deletions(word[:prefix_length], deletion_distance):
+                postings.setdefault(key.encode('utf-8'), []).append(ordinal)
+        keys = sorted(postings)
+        key_offsets, posting_offsets = [0], [0]
+        for key in keys:
+            key_offsets.append(key_offsets[-1] + len(key))
+            posting_offsets.append(posting_offsets[-1] + len(postings[key]))
+        section = bytearray(_table([len(keys)]))
+        section += _table(key_offsets)
+        section += _table(posting_offsets)
+        section += _table(ordinal for key in keys for ordinal in postings[key])
+        section += b''.join(keys)
+        _pad(section)
+        body += section
+    else:
+        deletion_distance, prefix_length = 0, 0
+
+    byte_order = b'<' if sys.byteorder == 'little' else b'>'
+    with open(filename, 'wb') as store_file:
+        store_file.write(HEADER.pack(MAGIC, byte_order, len(words),
+                                     max_length, offsets_start, data_start,
+                                     hash_start, slots, deletion_start,
+                                     deletion_distance, prefix_length))
+        store_file.write(body)
+
+
+class WordStore:
+    """
+    Read-only access to a word list written by write_word_store, without
+    reading the file into memory.
+
+    The file is memory-mapped and its tables are viewed in place, so opening
+    it only costs reading its header, the pages are shared by every process
+    opening the same file, and a str is only created for the words that are
+    looked at. Words are numbered in file order (by length, then by bytes):
+    store[k] returns the word k, 'word in store' and store.find(word) look
+    the word up in the hash table, in constant time on average.
+
+    query(word, dist) returns the set of words within edit distance 'dist'
+    of 'word', checked with 'distance', a bounded edit distance called as
+    distance(word, candidate, dist) (such as bounded_edit_distance). It uses
+    the prebuilt deletion section when the file has one and 'dist' is at
+    most its 'deletion_distance', else it scans the words whose length is
+    within 'dist' of the length of 'word'.
+    """
+
+    def __init__(self, filename, distance=None):
+        self.filename = filename
+        self.distance = distance
+        self._file = open(filename, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+            if self._map[:len(MAGIC)] != MAGIC or \
+                    len(self._map) < HEADER.size:
+                self._map.close()
+                raise ValueError('{} is not a word store of this version'
+                                 .format(filename))
+        except ValueError:
+            self._file.close()
+            raise
+        (magic, byte_order, self._count, self.max_length, offsets_start,
+         self._data_start, hash_start, self._slots, deletion_start,
+         self.deletion_distance,
+         self.prefix_length) = HEADER.unpack_from(self._map)
+        if byte_order != (b'<' if sys.byteorder == 'little' else b'>'):
+            self.close()
+            raise ValueError('{} was written with another byte order'
+                             .format(filename))
+
+        self._buckets = self._u32(HEADER.size, self.max_length + 2)
+        self._offsets = self._u32(offsets_start, self._count + 1)
+        self._hash = self._u32(hash_start, self._slots)
+        self._has_deletions = deletion_start > 0
+        if self._has_deletions:
+            key_count = self._u32(deletion_start, 1)[0]
+            start = deletion_start + 4
+            self._key_count = key_count
+            self._key_offsets = self._u32(start, key_count + 1)
+            start += 4 * (key_count + 1)
+            self._posting_offsets = self._u32(start, key_count + 1)
+            start += 4 * (key_count + 1)
+            self._postings = self._u32(start, self._posting_offsets[-1])
+            self._keys_start = start + 4 * self._posting_offsets[-1]
+
+    def __reduce__(self):
+        return (WordStore, (self.filename, self.distance))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Release the memory map and the file."""
+        for view in (getattr(self, name, None) for name in
+                     ('_buckets', '_offsets', '_hash', '_key_offsets',
+                      '_posting_offsets', '_postings')):
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+    def _u32(self, start, count):
+        """Return a view of 'count' unsigned 32-bit integers at 'start'."""
+        return memoryview(self._map)[start:start + 4 * count].cast('I')
+
+    def _bytes(self, ordinal):
+        start = self._data_start
+        return self._map[start + self._offsets[ordinal]:
+                         start + self._offsets[ordinal + 1]]
+
+    def _key(self, ordinal):
+        start = self._keys_start
+        return self._map[start + self._key_offsets[ordinal]:
+                         start + self._key_offsets[ordinal + 1]]
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, ordinal):
+        if not 0 <= ordinal < self._count:
+            raise IndexError('word store index out of range')
+        return self._bytes(ordinal).decode('utf-8')
+
+    def __iter__(self):
+        return (self[ordinal] for ordinal in range(self._count))
+
+    def __contains__(self, word):
+        return self.find(word) >= 0
+
+    def length_range(self, length):
+        """Return the range of the ordinals of the words of 'length'."""
+        if not 0 <= length <= self.max_length:
+            return range(0)
+        return range(self._buckets[length], self._buckets[length + 1])
+
+    def find(self, word):
+        """Return the ordinal of 'word', or -1 if it is not in the store."""
+        data = word.encode('utf-8')
+        table, mask = self._hash, self._slots - 1
+        slot = zlib.crc32(data) & mask
+        while table[slot]:
+            ordinal = table[slot] - 1
+            if self._bytes(ordinal) == data:
+                return ordinal
+            slot = (slot + 1) & mask
+        return -1
+
+    def _find_key(self, key):
+        """Return the ordinal of the deletion 'key', or -1."""
+        low, high = 0, self._key_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._key_count and self._key(low) == key:
+            return low
+        return -1
+
+    def candidates(self, word, dist):
+        """
+        Return the ordinals of the words that may be within edit distance
+        'dist' of 'word'.
+        """
+        if self._has_deletions and dist <= self.deletion_distance:
+            result = set()
+            for key in deletions(word[:self.prefix_length], dist):
+                ordinal = self._find_key(key.encode('utf-8'))
+                if ordinal >= 0:
+                    result.update(self._postings[
+                        self._posting_offsets[ordinal]:
+                        self._posting_offsets[ordinal + 1]])
+            return sorted(result)
+        low = max(0, len(word) - dist)
+        high = min(self.max_length, len(word) + dist)
+        if low > high:
+            return range(0)
+        return range(self._buckets[low], self._buckets[high + 1])
+
+    def query(self, word, dist):
+        """
+        (str, int) -> set
+
+        Return the set of the words within edit distance 'dist' of 'word'.
+        """
+        result = set()
+        for ordinal in self.candidates(word, dist):
+            candidate = self[ordinal]
+            if abs(len(candidate) - len(word)) <= dist and \
+                    self.distance(word, candidate, dist) <= dist:
+                result.add(candidate)
+        return result